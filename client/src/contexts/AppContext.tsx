@@ -100,22 +100,26 @@ export const AppContextProvider: React.FC<AppContextProps> = (props) => {
     setSessionsLoading(false);
   };
 
+  const showLapInfo = (data: DriverLaps | undefined) => {
+    setLapsList(
+      data &&
+        Object.entries(data).map(([driver, ls]) => ({
+          title: driver,
+          value: driver,
+          children: ls.laps.LapNumber.map((ln: number, i: number) => ({
+            title: `Lap ${ln} [${ls.laps.LapTime[i]}]`, //${ls.laps.PersonalBest ?''}
+            value: `${driver}-${ln}`,
+          })),
+        }))
+    );
+    setLapInfo(data);
+  };
+
   const getLapInfo = async () => {
     setLapsLoading(true);
     if (sessionInfo.year && sessionInfo.round && sessionInfo.session) {
-      const data = await getLapData(sessionInfo, setFormattedError);
-      setLapsList(
-        data &&
-          Object.entries(data).map(([driver, ls]) => ({
-            title: driver,
-            value: driver,
-            children: ls.laps.LapNumber.map((ln: number, i: number) => ({
-              title: `Lap ${ln} [${ls.laps.LapTime[i]}]`, //${ls.laps.PersonalBest ?''}
-              value: `${driver}-${ln}`,
-            })),
-          }))
-      );
-      setLapInfo(data);
+      // drivers are shown as they arrive, then once more with everything
+      showLapInfo(await getLapData(sessionInfo, setFormattedError, showLapInfo));
     }
     setLapsLoading(false);
   };
@@ -4,6 +4,16 @@ import { DriverLaps, LapTel } from "./graph-utils";
 import { compData, lapData, multiCompData, raceData } from "./test-data";
 
 const USE_TEST_DATA = false;
+// ask for /comp telemetry as typed arrays instead of JSON lists
+const USE_BINARY_COMP = true;
+const COLUMNS_MIMETYPE = "application/vnd.f1app.columns";
+// /comp telemetry is downsampled to about the width of the graphs, with floats rounded to this many decimals
+const COMP_MAX_POINTS = 1500;
+const COMP_PRECISION = 3;
+// get /laps as one line per driver, so drivers can be listed as they arrive. Off by default: streamed
+// responses aren't cached by the server and have no ETag, while the JSON response is revalidated with If-None-Match
+const USE_STREAMING_LAPS = false;
+const NDJSON_MIMETYPE = "application/x-ndjson";
 const apiClient = axios.create({
   baseURL: "http://localhost:8000",
   headers: {
@@ -11,6 +21,71 @@ const apiClient = axios.create({
   },
 });
 
+const columnArrayTypes = {
+  f4: Float32Array,
+  f8: Float64Array,
+  i4: Int32Array,
+  b1: Uint8Array,
+};
+
+// decodes the format written by to_binary in f1analysis/serialization.py back into plain JSON
+const decodeColumns = (buffer: ArrayBuffer) => {
+  const headerLength = new DataView(buffer).getUint32(0, true);
+  const dataStart = 4 + headerLength;
+  const header = new TextDecoder().decode(new Uint8Array(buffer, 4, headerLength));
+  return JSON.parse(header, (_key, value) => {
+    if (!value || typeof value !== "object" || !("$col" in value)) {
+      return value;
+    }
+    const { $col, offset, length } = value as { $col: keyof typeof columnArrayTypes; offset: number; length: number };
+    const values = Array.from(new columnArrayTypes[$col](buffer, dataStart + offset, length));
+    return $col === "b1" ? values.map((v) => v !== 0) : values.map((v) => (Number.isNaN(v) ? null : v));
+  });
+};
+
+const decodeResponse = (data: ArrayBuffer, contentType: string) => {
+  if (contentType.startsWith(COLUMNS_MIMETYPE)) {
+    return decodeColumns(data);
+  }
+  const text = new TextDecoder().decode(data);
+  try {
+    return JSON.parse(text);
+  } catch {
+    return text;
+  }
+};
+
+// responses kept so repeat requests can be revalidated with If-None-Match
+const MAX_ETAG_ENTRIES = 20;
+const etagCache = new Map<string, { etag: string; data: any }>();
+
+const postWithEtag = async (url: string, body: object, binary = false) => {
+  const key = url + JSON.stringify(body) + binary;
+  const cached = etagCache.get(key);
+  const res = await apiClient.post(url, body, {
+    headers: {
+      ...(cached ? { "If-None-Match": cached.etag } : {}),
+      ...(binary ? { Accept: `${COLUMNS_MIMETYPE}, application/json` } : {}),
+    },
+    responseType: binary ? "arraybuffer" : "json",
+    validateStatus: (status) => (status >= 200 && status < 300) || status === 304,
+  });
+  if (res.status === 304 && cached) {
+    return { ...res, data: cached.data };
+  }
+  if (binary) {
+    res.data = decodeResponse(res.data, String(res.headers["content-type"] ?? ""));
+  }
+  if (res.headers.etag) {
+    etagCache.delete(key);
+    etagCache.set(key, { etag: res.headers.etag, data: res.data });
+    if (etagCache.size > MAX_ETAG_ENTRIES) {
+      etagCache.delete(etagCache.keys().next().value);
+    }
+  }
+  return res;
+};
+
 export type SessionId = {
   year: string;
   round: string;
@@ -20,6 +95,8 @@ export type GraphArgs = {
   use_acc: boolean;
   x_axis: string;
   comb_laps: { [_key: string]: string[][] };
+  max_points?: number;
+  precision?: number;
 };
 
 export const getRaceData = async (
@@ -39,16 +116,58 @@ export const getRaceData = async (
   return res.data;
 };
 
-export const getLapData = async (
+// reads /laps line by line, calling onDriver with all drivers received so far after each one
+const streamLapData = async (
   reqData: SessionId,
+  onDriver: (_data: DriverLaps) => void,
   onError?: (_s: string) => void
+): Promise<DriverLaps | undefined> => {
+  const res = await fetch(`${apiClient.defaults.baseURL}/laps`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json", Accept: NDJSON_MIMETYPE },
+    body: JSON.stringify(reqData),
+  });
+  if (!res.ok || !res.body) {
+    onError && onError(await res.text());
+    return undefined;
+  }
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  const data: DriverLaps = {};
+  let buffered = "";
+  for (;;) {
+    const { done, value } = await reader.read();
+    buffered += decoder.decode(value, { stream: !done });
+    const lines = buffered.split("\n");
+    buffered = done ? "" : lines.pop() ?? "";
+    const records = lines.filter((l) => l.trim());
+    records.forEach((line) => {
+      const { driver, ...info } = JSON.parse(line);
+      data[driver] = info;
+    });
+    if (records.length) {
+      onDriver({ ...data });
+    }
+    if (done) {
+      return data;
+    }
+  }
+};
+
+export const getLapData = async (
+  reqData: SessionId,
+  onError?: (_s: string) => void,
+  onDriver?: (_data: DriverLaps) => void
 ): Promise<DriverLaps | undefined> => {
   if (USE_TEST_DATA) {
     return new Promise((resolve) => {
       resolve(JSON.parse(lapData));
     });
   }
-  const res = await apiClient.post("/laps", reqData);
+  if (USE_STREAMING_LAPS && onDriver) {
+    return streamLapData(reqData, onDriver, onError);
+  }
+  const res = await postWithEtag("/laps", reqData);
   if (typeof res.data !== "object") {
     onError && onError(res.data);
     return undefined;
@@ -68,11 +187,15 @@ export const getCompData = async (
     });
   }
   const newLaps = laps.map((l) => l.split("-"));
-  const res = await apiClient.post("/comp", {
-    ...session,
-    laps: newLaps,
-    args: graphArgs,
-  });
+  const res = await postWithEtag(
+    "/comp",
+    {
+      ...session,
+      laps: newLaps,
+      args: { max_points: COMP_MAX_POINTS, precision: COMP_PRECISION, ...graphArgs },
+    },
+    USE_BINARY_COMP
+  );
   if (!res?.data?.laptel) {
     onError && onError(res.data);
     return { laptel: undefined };
@@ -1,11 +1,19 @@
+import hashlib
 import json
 import logging
 import sys
+import time
 
 import fastf1
+from caching import LRUCache, estimate_session_bytes, load_session
+from comp_pool import CompPool, CompPoolBusyError, CompTimeoutError
+from downsampling import downsample_laps
 from f1functions import *
-from flask import Flask, request
+from flask import Flask, Response, g, has_request_context, request
 from flask_cors import CORS, cross_origin
+from prewarm import SessionPrewarmer
+from serialization import COLUMNS_MIMETYPE, NDJSON_MIMETYPE, Columns, to_binary, to_json
+from telemetry_store import TelemetryStore, ingest_executor
 
 logging.getLogger().setLevel(logging.INFO)
 
@@ -13,12 +21,37 @@ logging.getLogger().setLevel(logging.INFO)
 fastf1.Cache.enable_cache('./cache')
 
 app = Flask(__name__)
-cors = CORS(app)
+cors = CORS(app, expose_headers=['ETag'])
 app.config['CORS_HEADERS'] = 'Content-Type'
-
-
-def col_df(df):
-    return {c: json.loads(df[c].to_json(orient="values")) for c in df.columns}
+# loaded sessions kept in memory, evicted by estimated size and age
+app.config['SESSION_CACHE_MAX_BYTES'] = 4 * 1024 ** 3
+app.config['SESSION_CACHE_TTL'] = 6 * 60 * 60
+# sessions loaded in the background: a fixed list at startup, and optionally
+# every session of the current season shortly after it ends
+app.config['PREWARM_SESSIONS'] = []  # keys like "2022-11-Race"
+app.config['PREWARM_SCHEDULE'] = False
+app.config['PREWARM_WORKERS'] = 1
+app.config['PREWARM_DELAY'] = 30 * 60
+app.config['PREWARM_POLL_INTERVAL'] = 10 * 60
+# /comp computations run in this many worker processes (0 runs them in the request thread)
+app.config['COMP_POOL_WORKERS'] = 0
+app.config['COMP_POOL_MAX_PENDING'] = 8
+# session cache of EACH worker, on top of SESSION_CACHE_MAX_BYTES; a busy session can be kept by several workers
+app.config['COMP_POOL_SESSION_CACHE_MAX_BYTES'] = 512 * 1024 ** 2
+app.config['COMP_TIMEOUT'] = 120
+# seconds a worker may take to load a session before its first comparison there
+app.config['COMP_LOAD_TIMEOUT'] = 300
+# directory where the merged telemetry of every lap is stored after a session is first loaded (None disables it)
+app.config['TELEMETRY_STORE_DIR'] = None
+# serialized /laps and /comp responses kept in memory, evicted by size and age
+app.config['RESPONSE_CACHE_MAX_BYTES'] = 256 * 1024 ** 2
+app.config['RESPONSE_CACHE_TTL'] = 6 * 60 * 60
+# event schedules of the current and future seasons are fetched again after this many seconds, past seasons are kept
+app.config['SCHEDULE_CACHE_TTL'] = 60 * 60
+# largest number of minisectors /minisectors splits a lap into
+app.config['MAX_MINISECTORS'] = 200
+# any of the settings can be overridden with FLASK_<NAME> environment variables
+app.config.from_prefixed_env()
 
 
 lap_info_cols = ['Driver', 'Time', 'LapTime', 'LapNumber', 'Stint',
@@ -26,20 +59,106 @@ lap_info_cols = ['Driver', 'Time', 'LapTime', 'LapNumber', 'Stint',
                  'TyreLife', 'LapStartTime', 'PitOutTime', 'PitInTime', 'TrackStatus', 'IsPersonalBest']
 
 
-sessions = {}
-# TODO: make way for the sessions to clear out after some time
+sessions = LRUCache(app.config['SESSION_CACHE_MAX_BYTES'], ttl=app.config['SESSION_CACHE_TTL'],
+                    sizeof=estimate_session_bytes, name='sessions')
+
+
+telemetry_store = TelemetryStore(
+    app.config['TELEMETRY_STORE_DIR']) if app.config['TELEMETRY_STORE_DIR'] else None
+# sessions are ingested in a separate process, one at a time
+ingest_pool = ingest_executor('./cache') if telemetry_store is not None else None
 
 
 def get_session(year, round, session_name):
     hash_name = f"{year}-{round}-{session_name}"
-    if hash_name in sessions:
-        return sessions[hash_name]
-    # TODO: add a way to get the testing session
-    session = fastf1.get_session(
-        int(year), round if not round.isdigit() else int(round), session_name)
-    session.load(laps=True, telemetry=True, weather=False, messages=False)
-    sessions[hash_name] = session
-    return session
+    if has_request_context():
+        # measured again after the request, in case it attached caches to the session
+        g.setdefault('used_sessions', set()).add(hash_name)
+
+    def load():
+        session = load_session(year, round, session_name)
+        if telemetry_store is not None:
+            # stored telemetry is used once it's ingested, until then laps are merged as usual
+            telemetry_store.attach(session, hash_name, executor=ingest_pool, load_func=load_session)
+        return session
+    # concurrent requests for the same session share one load
+    return sessions.get_or_load(hash_name, load)
+
+
+@app.after_request
+def resize_used_sessions(response):
+    for hash_name in g.get('used_sessions', ()):
+        sessions.resize(hash_name)
+    return response
+
+
+schedules = LRUCache(64 * 1024 ** 2, sizeof=lambda entry: entry[0].nbytes + len(entry[1]) * 1024,
+                     name='schedules')
+
+
+def get_schedule(year):
+    '''
+    Gets the events of a season that have F1 API data, in the shape sent by
+    /races. Schedules are cached, past seasons for good and others for
+    SCHEDULE_CACHE_TTL.
+
+    :param int year: Season to get
+    :return Tuple(np.ndarray, List[Tuple(str, dict)]): date of each event, and its round number and {'EventName', 'Sessions'}
+    '''
+    def load():
+        es = fastf1.get_event_schedule(year)
+        es = es[es.F1ApiSupport]
+        names = es[[f"Session{i}" for i in range(1, 6)]].to_numpy()
+        has_session = names != "None"
+        return (es.EventDate.to_numpy(),
+                [(str(rn), {'EventName': name, "Sessions": list(event_sessions[has])})
+                 for rn, name, event_sessions, has in zip(es.RoundNumber, es.EventName, names, has_session)])
+    ttl = None if year < pd.Timestamp('now').year else app.config['SCHEDULE_CACHE_TTL']
+    return schedules.get_or_load(year, load, ttl=ttl)
+
+
+responses = LRUCache(app.config['RESPONSE_CACHE_MAX_BYTES'], ttl=app.config['RESPONSE_CACHE_TTL'],
+                     sizeof=lambda entry: len(entry[1]), name='responses')
+
+
+def cached_response(key, build):
+    '''
+    Returns the encoded response built by build, reusing the body stored for
+    the same request if there is one. Requests that list COLUMNS_MIMETYPE in
+    their Accept header get the binary encoding, others get JSON. The response
+    has a strong ETag of its content, and a request with a matching
+    If-None-Match header gets a 304.
+
+    :param dict key: Everything that the response depends on, must be JSON serializable
+    :param function build: Function without arguments that returns the response object, with dataframes wrapped in Columns
+    :return flask.Response: Response with ETag
+    '''
+    binary = any(m == COLUMNS_MIMETYPE for m, _q in request.accept_mimetypes)
+
+    def build_entry():
+        body = to_binary(build()) if binary else to_json(build()).encode()
+        return hashlib.sha256(body).hexdigest(), body
+    etag, body = responses.get_or_load(json.dumps(
+        {**key, 'binary': binary}, sort_keys=True, separators=(',', ':')), build_entry)
+    # make_conditional only handles GET requests, so check If-None-Match here
+    resp = Response(status=304) if request.if_none_match.contains(etag) else Response(
+        body, mimetype=COLUMNS_MIMETYPE if binary else 'application/json')
+    resp.set_etag(etag)
+    return resp
+
+
+prewarmer = SessionPrewarmer(get_session, workers=app.config['PREWARM_WORKERS'], delay=app.config['PREWARM_DELAY'],
+                             poll_interval=app.config['PREWARM_POLL_INTERVAL'])
+prewarmer.prewarm(app.config['PREWARM_SESSIONS'])
+if app.config['PREWARM_SCHEDULE']:
+    prewarmer.start()
+
+comp_pool = CompPool(app.config['COMP_POOL_WORKERS'], max_pending=app.config['COMP_POOL_MAX_PENDING'],
+                     timeout=app.config['COMP_TIMEOUT'], load_timeout=app.config['COMP_LOAD_TIMEOUT'],
+                     cache_dir='./cache',
+                     max_bytes=app.config['COMP_POOL_SESSION_CACHE_MAX_BYTES'],
+                     ttl=app.config['SESSION_CACHE_TTL'], store_dir=app.config['TELEMETRY_STORE_DIR']) \
+    if app.config['COMP_POOL_WORKERS'] else None
 
 
 @app.route("/")
@@ -48,30 +167,117 @@ def helloWorld():
     return "Hello, cross-origin-world!"
 
 
+@app.route("/cache", methods=['GET'])
+def get_cache_stats():
+    return json.dumps({'sessions': sessions.stats(), 'responses': responses.stats(), 'schedules': schedules.stats()})
+
+
 # TODO: could make these all into 'GET' functions, it would make more sense, but for now, this'll do
 
 @app.route("/races", methods=['POST'])
 def get_all_session_for_year():
     year = int(request.json['year'])
-    es = fastf1.get_event_schedule(year)
-    es = es[es.F1ApiSupport]
-    return json.dumps({str(row['RoundNumber']): {'EventName': row['EventName'],
-                                                 "Sessions": [row[f"Session{i}"] for i in range(1, 6) if row[f"Session{i}"] != "None"]}
-                      for _, row in es.iterrows() if row.EventDate <= pd.Timestamp('now') + pd.Timedelta(3, 'days') + pd.Timedelta(1, unit='d')})
+    event_dates, events = get_schedule(year)
+    started = event_dates <= np.datetime64(
+        pd.Timestamp('now') + pd.Timedelta(3, 'days') + pd.Timedelta(1, unit='d'))
+    return json.dumps(dict(event for event, s in zip(events, started) if s))
 
 
 @app.route("/laps", methods=["POST"])
 def get_laps_for_session():
     content = request.json
     year, round, session_name = content['year'], content['round'], content['session']
+
+    def driver_infos():
+        session = get_session(year, round, session_name)
+        driver_colors = get_best_colors(session.laps.Driver)
+        driver_names = {row['Abbreviation']: row['FullName']
+                        for i, row in session.results[['Abbreviation', 'FullName']].iterrows()}
+        return ((driver, {"laps": Columns(laps[lap_info_cols]),
+                          "color": driver_colors[driver],
+                          "fullName": driver_names[driver]}) for driver, laps in session.laps.groupby('Driver'))
+
+    if any(m == NDJSON_MIMETYPE for m, _q in request.accept_mimetypes):
+        # one line per driver, sent as soon as it's encoded, so the client can show drivers as they arrive
+        infos = driver_infos()
+        return Response((to_json({"driver": driver, **info}) + '\n' for driver, info in infos),
+                        mimetype=NDJSON_MIMETYPE)
+    return cached_response({'route': 'laps', 'year': str(year), 'round': str(round), 'session': session_name},
+                           lambda: dict(driver_infos()))
+
+
+@app.route("/minisectors", methods=["POST"])
+def get_minisectors_for_session():
+    content = request.json
+    year, round, session_name = content['year'], content['round'], content['session']
+    num_minisectors = content.get('minisectors', 25)
+    if not isinstance(num_minisectors, int) or isinstance(num_minisectors, bool) or \
+            not 1 <= num_minisectors <= app.config['MAX_MINISECTORS']:
+        return f"minisectors must be an integer from 1 to {app.config['MAX_MINISECTORS']}.", 400
+
+    def build():
+        session = get_session(year, round, session_name)
+        times = get_session_minisector_times(session, num_minisectors) * 1000
+        columns = [str(c) for c in times.columns]
+        # best time of each driver in each minisector, and the lap made of them
+        best = times.groupby(level='Driver', sort=False).min()
+        best['TheoreticalBest'] = best.sum(axis=1, min_count=num_minisectors)
+        fastest = times.min()
+        return {
+            "minisectors": num_minisectors,
+            "laps": Columns(times.set_axis(columns, axis=1).reset_index()),
+            "best": Columns(best.set_axis(columns + ['TheoreticalBest'], axis=1).reset_index()),
+            # driver with the fastest time in each minisector, for track dominance
+            "dominance": [best.index[best[c].to_numpy() == fastest[c]][0] if fastest.notna()[c] else None
+                          for c in times.columns],
+        }
+    return cached_response({'route': 'minisectors', 'year': str(year), 'round': str(round),
+                            'session': session_name, 'minisectors': num_minisectors}, build)
+
+
+@app.route("/degradation", methods=["POST"])
+def get_degradation_for_session():
+    content = request.json
+    year, round, session_name = content['year'], content['round'], content['session']
+    degree = content.get('degree', 1)
+    if degree not in (1, 2) or isinstance(degree, bool):
+        return "degree must be 1 (linear) or 2 (quadratic).", 400
+    fuel_corrected = bool(content.get('fuel_corrected', False))
+
+    def build():
+        session = get_session(year, round, session_name)
+        return {"degree": degree, "fuelCorrected": fuel_corrected,
+                "stints": Columns(get_session_degradation(session, degree, fuel_corrected))}
+    return cached_response({'route': 'degradation', 'year': str(year), 'round': str(round), 'session': session_name,
+                            'degree': degree, 'fuel_corrected': fuel_corrected}, build)
+
+
+@app.route("/replay", methods=["POST"])
+def replay_session():
+    content = request.json
+    year, round, session_name = content['year'], content['round'], content['session']
+    # seconds to wait between laps, for live-style dashboards
+    delay = content.get('delay', 0)
+    if not isinstance(delay, (int, float)) or delay < 0:
+        return "delay must be a non-negative number.", 400
     session = get_session(year, round, session_name)
-    driver_colors = get_best_colors(session.laps.Driver)
-    driver_names = {row['Abbreviation']: row['FullName']
-                    for i, row in session.results[['Abbreviation', 'FullName']].iterrows()}
-    return json.dumps(
-        {driver: {"laps": col_df(laps[lap_info_cols]),
-                  "color": driver_colors[driver],
-                  "fullName": driver_names[driver]} for driver, laps in session.laps.groupby('Driver')})
+    laps = session.laps[session.laps.LapNumber.notna()]
+    # checked before streaming starts, errors in the stream would cut the response short
+    if len(laps) == 0:
+        return "Session has no laps to replay.", 404
+
+    def steps():
+        # laps are fed in lap by lap, each lap in the order cars completed it
+        replay = RaceReplay(num_laps=int(laps.LapNumber.max()))
+        for lap_num, lap_laps in laps.groupby('LapNumber'):
+            new_laps, outliers = replay.append_laps(lap_laps.sort_values('Time'))
+            yield to_json({"lapNumber": lap_num,
+                           "laps": Columns(new_laps[lap_info_cols + ['GapToLeader']]),
+                           "outliers": [[driver, lap] for driver, lap in outliers],
+                           "stints": Columns(replay.get_stint_summary())}) + '\n'
+            if delay:
+                time.sleep(delay)
+    return Response(steps(), mimetype=NDJSON_MIMETYPE)
 
 
 @app.route("/comp", methods=["POST"])
@@ -80,39 +286,42 @@ def get_comp_for_laps():
     year, round, session_name, laps, func_args = content['year'], content[
         'round'], content['session'], content['laps'], content['args']
     x_ax, by_sector, comb_laps = func_args['x_axis'], func_args['use_acc'], func_args['comb_laps']
-    session = get_session(year, round, session_name)
-    sector_dists = None
-    comb_lap_dfs = {}
-    for l in laps:
-        if l[0] == 'COMB':
-            comb_lap_dfs[l[1]] = pd.concat(
-                [get_lap(session, lap[0], lap[1]) for lap in comb_laps[f"COMB-{l[1]}"]], ignore_index=True)
-    driver_laps = [get_lap(session, l[0], l[1]).iloc[0] if l[0] != 'COMB' else average_lap(
-        comb_lap_dfs[l[1]]) for l in laps]
-    driver_tel = [lap.get_telemetry() if lap[0] != 'COMB' else average_lap_tel(
-        get_lap_data(comb_lap_dfs[lap[1]], which="tel")) for lap in driver_laps]
-    if by_sector:
-        # if len(driver_tel) == 2 and not comb_lap_dfs:
-        #     resampled_driver_tel, sector_dists = resample_2_by_sector(
-        #         driver_laps[0], driver_laps[1], driver_tel[0], driver_tel[1], x_axis=x_ax, return_dists=True)
-        # else:
-        resampled_driver_tel, sector_dists = resample_all_by_sector(
-            driver_laps, driver_tel, x_axis=x_ax, return_dists=True)
-    else:
-        # if len(driver_tel) == 2 and not comb_lap_dfs:
-        #     resampled_driver_tel = resample_2_by_dist(
-        #         driver_tel[0], driver_tel[1], x_axis=x_ax)
-        # else:
-        resampled_driver_tel = resample_all_by_dist(
-            driver_tel, x_axis=x_ax)
-    return_info = {
-        "laptel": [
-            {
-                "driver": lap[0],
-                "lapNumber": lap[1],
-                "tel": col_df(resampled_driver_tel[i])
-            }
-            for i, lap in enumerate(laps)]}
-    if sector_dists is not None:
-        return_info['sectorDists'] = sector_dists
-    return json.dumps(return_info)
+    # optional: number of samples to keep per lap, and decimals to round float channels to
+    max_points, precision = func_args.get('max_points'), func_args.get('precision')
+    if max_points is not None and (not isinstance(max_points, int) or isinstance(max_points, bool) or max_points < 3):
+        return "max_points must be an integer of at least 3.", 400
+    if precision is not None and (not isinstance(precision, int) or isinstance(precision, bool) or precision < 0):
+        return "precision must be a non-negative integer.", 400
+    # only the COMB laps that are compared change the response
+    used_comb_laps = {f"COMB-{l[1]}": comb_laps[f"COMB-{l[1]}"]
+                      for l in laps if l[0] == 'COMB'}
+
+    def build():
+        if comp_pool is not None:
+            resampled_driver_tel, sector_dists = comp_pool.run(
+                year, round, session_name, laps, x_ax, by_sector, used_comb_laps)
+        else:
+            session = get_session(year, round, session_name)
+            resampled_driver_tel, sector_dists = compare_session_laps(
+                session, laps, x_axis=x_ax, by_sector=by_sector, comb_laps=used_comb_laps)
+        resampled_driver_tel = downsample_laps(
+            resampled_driver_tel, x_axis=x_ax, max_points=max_points, precision=precision)
+        return_info = {
+            "laptel": [
+                {
+                    "driver": lap[0],
+                    "lapNumber": lap[1],
+                    "tel": Columns(resampled_driver_tel[i])
+                }
+                for i, lap in enumerate(laps)]}
+        if sector_dists is not None:
+            return_info['sectorDists'] = sector_dists
+        return return_info
+    try:
+        return cached_response({'route': 'comp', 'year': str(year), 'round': str(round), 'session': session_name,
+                                'laps': laps, 'x_axis': x_ax, 'use_acc': by_sector, 'comb_laps': used_comb_laps,
+                                'max_points': max_points, 'precision': precision}, build)
+    except CompPoolBusyError:
+        return "Too many comparisons are running, try again in a moment.", 503
+    except CompTimeoutError:
+        return "The comparison took too long to compute.", 504
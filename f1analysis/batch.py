@@ -0,0 +1,228 @@
+'''
+Runs f1functions analyses on many sessions and writes the results as
+Parquet, partitioned like <out>/<analysis>/year=<year>/round=<round>/session=<session>/.
+
+    python batch.py 2022 --analyses stint_summary flat_out --workers 4
+    python batch.py --sessions 2022-11-Race 2022-12-Race
+
+Each partition gets a _SUCCESS file once it's written, and partitions that
+have one are skipped, so an interrupted run can be started again with the
+same arguments. Writing Parquet needs pyarrow or fastparquet.
+'''
+import argparse
+import importlib.util
+import logging
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import fastf1
+import pandas as pd
+from caching import load_session
+from f1functions import (LapComparison, RacePace, get_fastest_lap, get_flat_out_overview, get_lap_data,
+                         get_session_degradation)
+from prewarm import get_ready_sessions, parse_session_key
+
+_logger = logging.getLogger(__name__)
+
+
+def stint_summary(session):
+    return RacePace(session).get_stint_summary()
+
+
+def fastest_laps(session):
+    '''
+    Speed along every driver's fastest lap against the fastest lap of the
+    session, with LapComparison.
+
+    :param fastf1.core.Session session: Loaded session
+    :return pd.DataFrame: Driver, Reference, both lap times, and the speed comparison by RelativeDistance
+    '''
+    reference = session.laps.pick_fastest()
+    columns = ['RelativeDistance', 'Distance', 'Speed_x', 'Speed_y', 'Speed_diff']
+    comps = []
+    for driver in session.laps.Driver.dropna().unique():
+        lap = get_fastest_lap(session, driver)
+        if lap is None or pd.isna(lap.get('LapTime')) or driver == reference['Driver']:
+            continue
+        comp = LapComparison(session, lap1=lap, lap2=reference)
+        comp.calculate_speed_comp()
+        comps.append(pd.DataFrame(comp.speed_comp[columns])
+                     .assign(Driver=driver, Reference=reference['Driver'],
+                             LapTime=lap['LapTime'], ReferenceLapTime=reference['LapTime']))
+    if not comps:
+        # nobody to compare against the reference, e.g. a single driver
+        return pd.DataFrame(columns=columns + ['Driver', 'Reference', 'LapTime', 'ReferenceLapTime'])
+    return pd.concat(comps, ignore_index=True)
+
+
+def flat_out(session):
+    laps = session.laps[session.laps.LapTime.notna()]
+    overview = get_flat_out_overview(get_lap_data(laps, which='car', batch=True),
+                                     crit=['Driver', 'LapNumber', 'nGear'])
+    return overview.rename_axis('Section').reset_index()
+
+
+def degradation(session):
+    return get_session_degradation(session)
+
+
+# analyses that can be run, each takes a loaded session and returns a dataframe
+analyses = {
+    'stint_summary': stint_summary,
+    'fastest_laps': fastest_laps,
+    'flat_out': flat_out,
+    'degradation': degradation,
+}
+
+
+def get_parquet_engine():
+    '''
+    :return str: 'pyarrow' or 'fastparquet', whichever is installed, None if neither is
+    '''
+    return next((engine for engine in ('pyarrow', 'fastparquet') if importlib.util.find_spec(engine)), None)
+
+
+def partition_dir(out_dir, analysis, key):
+    year, round, session_name = parse_session_key(key)
+    return os.path.join(out_dir, analysis, f"year={year}", f"round={round}", f"session={session_name}")
+
+
+def is_done(out_dir, analysis, key):
+    return os.path.exists(os.path.join(partition_dir(out_dir, analysis, key), '_SUCCESS'))
+
+
+def write_partition(df, out_dir, analysis, key, engine):
+    '''
+    Writes the result of an analysis of one session, then marks it done.
+    The file is written under a temporary name first, so a partition is
+    never left half written.
+
+    :param pd.DataFrame df: Result of the analysis
+    :param str out_dir: Output directory
+    :param str analysis: Name of the analysis
+    :param str key: Session key, like '2022-11-Race'
+    :param str engine: Parquet engine
+    '''
+    path = partition_dir(out_dir, analysis, key)
+    os.makedirs(path, exist_ok=True)
+    df = pd.DataFrame(df)
+    # parquet needs string column names
+    df.columns = ['_'.join(str(part) for part in c if part != '') if isinstance(c, tuple) else str(c)
+                  for c in df.columns]
+    tmp_path = os.path.join(path, 'part-0.parquet.tmp')
+    df.to_parquet(tmp_path, engine=engine, index=False)
+    os.replace(tmp_path, os.path.join(path, 'part-0.parquet'))
+    open(os.path.join(path, '_SUCCESS'), 'w').close()
+
+
+def _init_worker(cache_dir):
+    fastf1.Cache.enable_cache(cache_dir)
+
+
+def run_session(key, analysis_names, out_dir, engine):
+    '''
+    Loads a session and runs the analyses it doesn't have results for yet.
+
+    :param str key: Session key, like '2022-11-Race'
+    :param List[str] analysis_names: Analyses to run
+    :param str out_dir: Output directory
+    :param str engine: Parquet engine
+    :return Tuple(List[str], Dict[str, str]): Analyses written, and the error of each analysis that failed
+    '''
+    pending = [a for a in analysis_names if not is_done(out_dir, a, key)]
+    if not pending:
+        return [], {}
+    try:
+        session = load_session(*parse_session_key(key))
+    except Exception as e:
+        return [], {a: f"loading failed: {e!r}" for a in pending}
+    written, errors = [], {}
+    for analysis in pending:
+        try:
+            write_partition(analyses[analysis](session), out_dir, analysis, key, engine)
+            written.append(analysis)
+        except Exception as e:
+            errors[analysis] = repr(e)
+    return written, errors
+
+
+def get_season_sessions(year, now=None):
+    '''
+    :param int year: Season
+    :param pd.Timestamp now: Current time in UTC (timezone naive), defaults to now
+    :return List[str]: Keys of every session of the season that should have data by now
+    '''
+    now = pd.Timestamp.now('UTC').tz_localize(None) if now is None else now
+    return get_ready_sessions(year, now, pd.Timedelta(hours=1), now - pd.Timestamp(year, 1, 1))
+
+
+def run_batch(keys, analysis_names, out_dir, workers=None, cache_dir='./cache', engine='pyarrow'):
+    '''
+    Runs the analyses of every session across a pool of worker processes,
+    each session in one worker. Sessions with every result present aren't
+    loaded at all.
+
+    :param List[str] keys: Session keys, like '2022-11-Race'
+    :param List[str] analysis_names: Analyses to run
+    :param str out_dir: Output directory
+    :param int workers: Number of worker processes, defaults to the number of CPUs (0 runs sessions in this process)
+    :param str cache_dir: fastf1 cache directory, defaults to './cache'
+    :param str engine: Parquet engine, defaults to 'pyarrow'
+    :return Dict[str, Dict[str, str]]: Errors of each session with failed analyses
+    '''
+    todo = [k for k in keys if not all(is_done(out_dir, a, k) for a in analysis_names)]
+    _logger.info(f"{len(keys) - len(todo)} of {len(keys)} sessions already done")
+    failed = {}
+
+    def report(key, result):
+        try:
+            written, errors = result()
+        except Exception as e:
+            written, errors = [], {'*': repr(e)}
+        _logger.info(f"{key}: wrote {', '.join(written) or 'nothing'}")
+        for analysis, error in errors.items():
+            _logger.error(f"{key}: {analysis} failed: {error}")
+        if errors:
+            failed[key] = errors
+    if not todo:
+        return failed
+    if workers == 0:
+        for key in todo:
+            report(key, lambda: run_session(key, analysis_names, out_dir, engine))
+        return failed
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'), initializer=_init_worker,
+                             initargs=(os.path.abspath(cache_dir),)) as executor:
+        futures = {executor.submit(run_session, k, analysis_names, out_dir, engine): k for k in todo}
+        for future in as_completed(futures):
+            report(futures[future], future.result)
+    return failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run f1functions analyses on many sessions, writing Parquet.')
+    parser.add_argument('year', nargs='?', type=int, help='run every session of this season that has data')
+    parser.add_argument('--sessions', nargs='+', default=[], metavar='KEY',
+                        help='sessions to run, like 2022-11-Race (added to the season\'s)')
+    parser.add_argument('--analyses', nargs='+', default=list(analyses), choices=list(analyses),
+                        help='analyses to run, defaults to all')
+    parser.add_argument('--out', default='./batch_output', help='output directory, defaults to ./batch_output')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes, defaults to the number of CPUs, 0 runs sessions in this process')
+    parser.add_argument('--cache', default='./cache', help='fastf1 cache directory, defaults to ./cache')
+    args = parser.parse_args(argv)
+    if args.year is None and not args.sessions:
+        parser.error('give a year or --sessions')
+    engine = get_parquet_engine()
+    if engine is None:
+        parser.error('writing Parquet needs pyarrow or fastparquet installed')
+    logging.basicConfig(level=logging.INFO)
+    fastf1.Cache.enable_cache(args.cache)
+    keys = (get_season_sessions(args.year) if args.year is not None else []) + args.sessions
+    failed = run_batch(list(dict.fromkeys(keys)), args.analyses, args.out,
+                       workers=args.workers, cache_dir=args.cache, engine=engine)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
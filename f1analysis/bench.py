@@ -0,0 +1,223 @@
+'''
+Offline benchmarks of the f1functions hot paths and the /laps and /comp
+endpoints. Sessions are generated, so nothing is downloaded.
+
+    python bench.py --drivers 4 --laps 5 20 --sample-rates 4 10
+
+Every benchmark runs on every combination of the parameters, and reports
+the best and median time of a few runs, and the peak memory allocated
+during one more run (measured with tracemalloc, which slows it down, so
+it's kept out of the timed runs).
+'''
+import argparse
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+import types
+
+import numpy as np
+import pandas as pd
+from fastf1.core import Laps, Session, SessionResults, Telemetry
+
+driver_codes = ['VER', 'PER', 'LEC', 'SAI', 'HAM', 'RUS', 'NOR', 'PIA', 'ALO', 'STR',
+                'OCO', 'GAS', 'ALB', 'SAR', 'BOT', 'ZHO', 'MAG', 'HUL', 'TSU', 'RIC']
+track_length = 5000.0
+
+
+def make_session(num_drivers=4, num_laps=10, sample_rate=4, seed=0):
+    '''
+    Builds a loaded-looking session without fastf1's API: laps, car data and
+    position data of cars going around an oval whose speed changes along
+    the lap. Works with get_session, the lap and telemetry functions and the
+    endpoints.
+
+    :param int num_drivers: Number of drivers, at most 20
+    :param int num_laps: Laps done by each driver
+    :param float sample_rate: Car data samples per second, position data gets a bit less
+    :param int seed: Random seed
+    :return fastf1.core.Session: Session with laps, car_data, pos_data and results
+    '''
+    rng = np.random.default_rng(seed)
+    session = Session.__new__(Session)
+    session.name = 'Race'
+    session.event = types.SimpleNamespace(OfficialEventName='Benchmark Grand Prix', EventName='Benchmark')
+    t0 = pd.Timestamp('2022-07-03 13:00:00')
+    start = pd.Timedelta(seconds=100)
+    # cars sit on the grid for a while before the start, so the first lap has samples before it like real data
+    grid_wait = 10.0
+    codes, numbers = driver_codes[:num_drivers], [str(i + 1) for i in range(num_drivers)]
+    # one metre steps along the whole race
+    dists = np.arange(0, track_length * num_laps + 1, 1.0)
+    base_speed = 200 + 90 * np.sin(6 * np.pi * dists / track_length) + 30 * np.cos(14 * np.pi * dists / track_length)
+    speeds = [base_speed * ((1 - 0.005 * d) * (1 + 0.003 * rng.standard_normal(num_laps + 1)))[
+        (dists // track_length).astype(int)] for d in range(num_drivers)]
+    all_times = [np.r_[0, np.cumsum(1 / (speed[:-1] / 3.6))] for speed in speeds]
+
+    # every driver is sampled at the same times, like the timing feed
+    def sample(rate):
+        ts = np.arange(-grid_wait, max(times[-1] for times in all_times), 1 / rate)
+        return np.sort(ts + rng.uniform(0, 1 / rate / 3, len(ts)))
+    car_grid, pos_grid = sample(sample_rate), sample(sample_rate * 0.8)
+    car_data, pos_data, laps = {}, {}, []
+    for code, number, speed, times in zip(codes, numbers, speeds, all_times):
+        car_times = car_grid[car_grid <= times[-1]]
+        car_dists = np.interp(car_times, times, dists)
+        car_speed = np.where(car_times < 0, 0.0, np.interp(car_dists, dists, speed))
+        session_times = start + pd.to_timedelta(car_times, unit='s')
+        car_data[number] = Telemetry({
+            'Date': t0 + session_times, 'RPM': car_speed * 50, 'Speed': car_speed,
+            'nGear': np.clip((car_speed // 40).astype(int), 1, 8), 'Throttle': np.where(car_speed > 200, 100.0, 40.0),
+            'Brake': car_speed < 150, 'DRS': np.where(car_speed > 270, 12, 0), 'Source': 'car',
+            'Time': session_times - session_times[0], 'SessionTime': session_times}, session=session, driver=number)
+        pos_times = pos_grid[pos_grid <= times[-1]]
+        angles = 2 * np.pi * (np.interp(pos_times, times, dists) % track_length) / track_length
+        session_times = start + pd.to_timedelta(pos_times, unit='s')
+        pos_data[number] = Telemetry({
+            'Date': t0 + session_times, 'Status': 'OnTrack', 'X': 1000 * np.cos(angles), 'Y': 700 * np.sin(angles),
+            'Z': 10 * np.sin(3 * angles), 'Source': 'pos', 'Time': session_times - session_times[0],
+            'SessionTime': session_times}, session=session, driver=number)
+        # time at the end of every sector, lap after lap
+        ends = pd.to_timedelta(np.interp(np.arange(3 * num_laps + 1) * track_length / 3, dists, times), unit='s')
+        for i in range(num_laps):
+            lap_start, s1, s2, lap_end = ends[3 * i:3 * i + 4]
+            laps.append({
+                'Time': start + lap_end, 'Driver': code, 'DriverNumber': number, 'LapTime': lap_end - lap_start,
+                'LapNumber': float(i + 1), 'Stint': 1.0 if i < num_laps // 2 else 2.0,
+                'PitOutTime': pd.NaT, 'PitInTime': pd.NaT,
+                'Sector1Time': s1 - lap_start, 'Sector2Time': s2 - s1, 'Sector3Time': lap_end - s2,
+                'Sector1SessionTime': start + s1, 'Sector2SessionTime': start + s2, 'Sector3SessionTime': start + lap_end,
+                'IsPersonalBest': True, 'Compound': 'SOFT' if i < num_laps // 2 else 'HARD',
+                'TyreLife': float(i + 1), 'LapStartTime': start + lap_start, 'TrackStatus': '1', 'Team': 'Team'})
+    session._laps = Laps(pd.DataFrame(laps), session=session)
+    session._car_data, session._pos_data = car_data, pos_data
+    session._t0_date = t0
+    session._results = SessionResults(pd.DataFrame({
+        'DriverNumber': numbers, 'Abbreviation': codes, 'FullName': [f"Driver {c}" for c in codes]}))
+    return session
+
+
+def run_benchmark(func, repeat=3):
+    '''
+    :param function func: Function without arguments to time
+    :param int repeat: Number of timed runs
+    :return Tuple(float, float, float): Best and median seconds of the timed runs, and peak MB allocated during another run
+    '''
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        func()
+        _current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return min(times), statistics.median(times), peak / 1024 ** 2
+
+
+def function_benchmarks(session):
+    '''
+    :param fastf1.core.Session session: Session to run on
+    :return Dict[str, function]: Benchmarks of the f1functions hot paths, by name
+    '''
+    from f1functions import (average_lap_tel, compare_lap_times, get_fastest_lap, get_lap_data, get_lap_telemetry,
+                             hampel, index_laps, resample_all_by_dist, resample_all_by_sector)
+    from serialization import columns_json, to_binary, Columns
+    index_laps(session)
+    drivers = list(session.laps.Driver.unique())
+    fastest = [get_fastest_lap(session, d) for d in drivers]
+    fastest_tels = [get_lap_telemetry(lap) for lap in fastest]
+    driver_laps = session.laps.pick_drivers(drivers[0])
+    driver_tel = get_lap_data(driver_laps, which='tel', batch=True)
+    speeds = pd.Series(pd.concat(list(session.car_data.values())).Speed.to_numpy())
+    return {
+        'get_lap_data car': lambda: get_lap_data(session.laps, which='car', batch=True),
+        'get_lap_data tel': lambda: get_lap_data(session.laps, which='tel', batch=True),
+        'resample_all_by_dist': lambda: resample_all_by_dist(fastest_tels),
+        'resample_all_by_sector': lambda: resample_all_by_sector(fastest, fastest_tels),
+        'compare_lap_times': lambda: compare_lap_times(fastest_tels[0], fastest_tels[1]),
+        'average_lap_tel': lambda: average_lap_tel(driver_tel),
+        'hampel': lambda: hampel(speeds, k=7),
+        'columns_json': lambda: columns_json(driver_tel),
+        'to_binary': lambda: to_binary({'tel': Columns(driver_tel)}),
+    }
+
+
+def endpoint_benchmarks(session):
+    '''
+    Times requests through the Flask test client, with the session put in
+    the app's session cache and the response cache emptied before each one.
+
+    :param fastf1.core.Session session: Session to run on
+    :return Dict[str, function]: Benchmarks of the endpoints, by name
+    '''
+    # the app turns on fastf1's cache in ./cache when it's imported, which fails if it doesn't exist
+    os.makedirs('./cache', exist_ok=True)
+    import app as server
+    server.sessions.put('2022-1-Race', session, size=1)
+    client = server.app.test_client()
+    session_id = {'year': 2022, 'round': 1, 'session': 'Race'}
+    drivers = list(session.laps.Driver.unique())
+    comp_laps = [[d, int(server.get_fastest_lap(session, d).LapNumber)] for d in drivers[:2]]
+
+    def post(url, body, headers=None):
+        def request():
+            server.responses.clear()
+            res = client.post(url, json=body, headers=headers)
+            if res.status_code != 200:
+                raise Exception(f"{url} returned {res.status_code}: {res.get_data(as_text=True)[:200]}")
+            # streamed responses are only built while they are read
+            res.get_data()
+        return request
+    comp_args = {'x_axis': 'Distance', 'use_acc': False, 'comb_laps': {}, 'max_points': 1500, 'precision': 3}
+    return {
+        '/laps': post('/laps', session_id),
+        '/laps ndjson': post('/laps', session_id, {'Accept': server.NDJSON_MIMETYPE}),
+        '/comp': post('/comp', {**session_id, 'laps': comp_laps, 'args': comp_args}),
+        '/comp by sector': post('/comp', {**session_id, 'laps': comp_laps, 'args': {**comp_args, 'use_acc': True}}),
+        '/comp binary': post('/comp', {**session_id, 'laps': comp_laps, 'args': comp_args},
+                             {'Accept': server.COLUMNS_MIMETYPE}),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark f1functions and the API on generated sessions.')
+    parser.add_argument('--drivers', type=int, default=4, help='drivers in each session, defaults to 4')
+    parser.add_argument('--laps', type=int, nargs='+', default=[5, 20], help='laps per driver, defaults to 5 20')
+    parser.add_argument('--sample-rates', type=float, nargs='+', default=[4],
+                        help='car data samples per second (telemetry length), defaults to 4')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs of each benchmark, defaults to 3')
+    parser.add_argument('--only', nargs='+', default=None, metavar='NAME',
+                        help='run only the benchmarks whose names start with one of these')
+    parser.add_argument('--no-endpoints', action='store_true', help='skip the Flask endpoints')
+    parser.add_argument('--output', default=None, help='also write the results to this file')
+    args = parser.parse_args(argv)
+    if not 1 < args.drivers <= len(driver_codes):
+        parser.error(f"--drivers must be between 2 and {len(driver_codes)}")
+
+    lines = [f"{'benchmark':<24}{'laps':>6}{'rate':>6}{'samples':>10}{'best s':>10}{'median s':>10}{'peak MB':>10}"]
+    print(lines[0], flush=True)
+    for num_laps in args.laps:
+        for rate in args.sample_rates:
+            session = make_session(args.drivers, num_laps, rate)
+            samples = sum(len(tel) for tel in session.car_data.values())
+            benchmarks = function_benchmarks(session)
+            if not args.no_endpoints:
+                benchmarks.update(endpoint_benchmarks(session))
+            for name, func in benchmarks.items():
+                if args.only is not None and not any(name.startswith(o) for o in args.only):
+                    continue
+                best, median, peak = run_benchmark(func, args.repeat)
+                lines.append(f"{name:<24}{num_laps:>6}{rate:>6g}{samples:>10}{best:>10.4f}{median:>10.4f}{peak:>10.1f}")
+                print(lines[-1], flush=True)
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
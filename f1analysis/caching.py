@@ -0,0 +1,280 @@
+import logging
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import fastf1
+import pandas as pd
+from f1functions import index_laps
+
+_logger = logging.getLogger(__name__)
+_missing = object()
+
+# session attributes that hold the bulk of a loaded session's memory
+session_data_attrs = ['laps', 'results', 'car_data', 'pos_data', 'weather_data',
+                      'track_status', 'session_status', 'race_control_messages']
+# caches that f1functions attaches to a session after it is loaded
+session_cache_attrs = ['lap_positions', 'fastest_lap_positions', 'minisector_times', 'lap_averages', 'degradation']
+
+
+def load_session(year, round, session_name):
+    # TODO: add a way to get the testing session
+    session = fastf1.get_session(
+        int(year), round if not round.isdigit() else int(round), session_name)
+    session.load(laps=True, telemetry=True, weather=False, messages=False)
+    index_laps(session)
+    return session
+
+
+def estimate_frame_bytes(df):
+    '''
+    Returns the memory used by a dataframe, including the contents of object columns.
+
+    :param pd.DataFrame df: Dataframe to measure
+    :return int: Number of bytes used by df
+    '''
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+def estimate_value_bytes(value):
+    '''
+    Estimates the memory held by a cached value: dataframes like
+    estimate_frame_bytes, arrays and objects with an nbytes attribute (like
+    LapAverage) by it, and dicts, lists and tuples by their contents.
+
+    :param value: Value to measure
+    :return int: Estimated number of bytes used by value
+    '''
+    if isinstance(value, pd.DataFrame):
+        return estimate_frame_bytes(value)
+    if isinstance(value, dict):
+        # list() so another thread adding entries doesn't break the iteration
+        return sys.getsizeof(value) + sum(sys.getsizeof(k) + estimate_value_bytes(v) for k, v in list(value.items()))
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_value_bytes(v) for v in value)
+    nbytes = getattr(value, 'nbytes', None)
+    return int(nbytes) if nbytes is not None else sys.getsizeof(value)
+
+
+def estimate_session_bytes(session):
+    '''
+    Estimates the memory held by a loaded fastf1 session by summing the
+    memory of every dataframe it holds (laps, results and the per-driver
+    car and position telemetry), and of the caches attached to it since
+    (see session_cache_attrs). Data that was not loaded is skipped.
+
+    The loaded data doesn't change, so it's measured once and remembered on
+    the session, and measuring again only goes through the caches.
+
+    :param fastf1.core.Session session: Loaded session to measure
+    :return int: Estimated number of bytes used by the session
+    '''
+    if getattr(session, 'estimated_data_bytes', None) is None:
+        total = 0
+        for attr in session_data_attrs:
+            try:
+                data = getattr(session, attr)
+            except Exception:  # fastf1 raises if the data was not loaded
+                continue
+            frames = data.values() if isinstance(data, dict) else [data]
+            total += sum(estimate_frame_bytes(f)
+                         for f in frames if isinstance(f, pd.DataFrame))
+        session.estimated_data_bytes = total
+    return session.estimated_data_bytes + sum(estimate_value_bytes(getattr(session, attr))
+                                              for attr in session_cache_attrs
+                                              if getattr(session, attr, None) is not None)
+
+
+class LRUCache:
+    '''
+    Thread-safe least-recently-used cache with a total byte budget and a
+    per-entry time to live. The size of each entry is given by sizeof, so
+    the budget reflects the memory actually held rather than the entry count.
+    '''
+
+    def __init__(self, max_bytes, ttl=None, sizeof=None, name='cache'):
+        '''
+        :param int max_bytes: Total size of entries kept before least-recently-used entries are evicted
+        :param float ttl: Seconds an entry stays valid after it is stored, defaults to None (never expires)
+        :param function sizeof: Function returning the size in bytes of a value, defaults to None (every entry is 1 byte)
+        :param str name: Name used when logging, defaults to 'cache'
+        '''
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.sizeof = sizeof if sizeof is not None else (lambda _v: 1)
+        self.name = name
+        self._entries = OrderedDict()  # key -> (value, size, expires_at)
+        self._lock = threading.RLock()
+        self._loading = {}  # key -> Future of the load in progress
+        self.resident_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.coalesced = 0
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries and not self._expired(key)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _expired(self, key):
+        expires_at = self._entries[key][2]
+        return expires_at is not None and expires_at <= time.monotonic()
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self.resident_bytes -= size
+
+    def get(self, key, default=None):
+        '''
+        Returns the value stored for key and marks it as most recently used.
+
+        :param key: Key of the entry
+        :param default: Value returned if key is missing or expired, defaults to None
+        :return: Stored value or default
+        '''
+        with self._lock:
+            if key in self._entries and self._expired(key):
+                self._remove(key)
+                self.expirations += 1
+            if key not in self._entries:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key][0]
+
+    def get_or_load(self, key, loader, ttl=...):
+        '''
+        Returns the value stored for key, calling loader to create and store it
+        if it is missing. Only one load runs per key at a time: callers that
+        arrive while a load is in progress wait for it and share its result.
+        If the load raises, every waiting caller gets the exception and nothing
+        is stored, so the next call tries again.
+
+        :param key: Key of the entry
+        :param function loader: Function without arguments that returns the value
+        :param float ttl: Seconds the entry stays valid, defaults to the cache ttl
+        :return: Stored or loaded value
+        '''
+        with self._lock:
+            value = self.get(key, _missing)
+            if value is not _missing:
+                return value
+            future = self._loading.get(key)
+            is_loader = future is None
+            if is_loader:
+                future = self._loading[key] = Future()
+            else:
+                self.coalesced += 1
+        if not is_loader:
+            return future.result()
+        try:
+            value = loader()
+            self.put(key, value, ttl=ttl)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(value)
+            return value
+        finally:
+            with self._lock:
+                del self._loading[key]
+
+    def put(self, key, value, size=None, ttl=...):
+        '''
+        Stores value under key, evicting expired and then least-recently-used
+        entries until it fits in the byte budget. Values larger than the whole
+        budget are not stored.
+
+        :param key: Key of the entry
+        :param value: Value to store
+        :param int size: Size of value in bytes, defaults to None (computed with sizeof)
+        :param float ttl: Seconds the entry stays valid, defaults to the cache ttl (None never expires)
+        :return bool: Whether or not the value was stored
+        '''
+        size = self.sizeof(value) if size is None else size
+        ttl = self.ttl if ttl is ... else ttl
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if size > self.max_bytes:
+                _logger.warning(f"{self.name}: {key} needs {size} bytes, more than the "
+                                f"{self.max_bytes} byte budget, so it was not cached")
+                return False
+            self._evict(size)
+            expires_at = time.monotonic() + ttl if ttl is not None else None
+            self._entries[key] = (value, size, expires_at)
+            self.resident_bytes += size
+            return True
+
+    def resize(self, key):
+        '''
+        Measures an entry again with sizeof, for values that grew since they
+        were stored, like sessions that got caches attached. The entry is
+        marked as most recently used, and other entries are evicted if the
+        cache is over budget.
+
+        :param key: Key of the entry
+        :return bool: Whether or not the entry is still stored
+        '''
+        with self._lock:
+            if key not in self._entries:
+                return False
+            value = self._entries[key][0]
+        size = self.sizeof(value)
+        with self._lock:
+            if key not in self._entries or self._entries[key][0] is not value:
+                return False
+            _, old_size, expires_at = self._entries[key]
+            self._entries[key] = (value, size, expires_at)
+            self.resident_bytes += size - old_size
+            if size > self.max_bytes:
+                _logger.warning(f"{self.name}: {key} grew to {size} bytes, more than the "
+                                f"{self.max_bytes} byte budget, so it was removed")
+                self._remove(key)
+                return False
+            self._entries.move_to_end(key)
+            self._evict(0)
+            return True
+
+    def _evict(self, needed):
+        for key in [k for k in self._entries if self._expired(k)]:
+            self._remove(key)
+            self.expirations += 1
+        while self._entries and self.resident_bytes + needed > self.max_bytes:
+            key = next(iter(self._entries))
+            self._remove(key)
+            self.evictions += 1
+            _logger.info(f"{self.name}: evicted {key}")
+
+    def pop(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                return default
+            value = self._entries[key][0]
+            self._remove(key)
+            return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.resident_bytes = 0
+
+    def stats(self):
+        '''
+        Returns counters describing how the cache has been used.
+
+        :return dict: hits, misses, coalesced loads, evictions, expirations, entries, loads in progress, resident and max bytes
+        '''
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'coalesced': self.coalesced,
+                    'evictions': self.evictions, 'expirations': self.expirations,
+                    'entries': len(self._entries), 'loading': len(self._loading),
+                    'residentBytes': self.resident_bytes, 'maxBytes': self.max_bytes}
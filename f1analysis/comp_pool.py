@@ -0,0 +1,196 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+import fastf1
+import pandas as pd
+from caching import LRUCache, estimate_session_bytes, load_session
+from f1functions import compare_session_laps
+from telemetry_store import TelemetryStore
+
+# sessions and telemetry store of this worker process, set up by _init_worker
+_sessions = None
+_store = None
+
+
+class CompPoolBusyError(Exception):
+    '''Raised when every worker is busy and the queue of waiting comparisons is full.'''
+
+
+class CompTimeoutError(Exception):
+    '''Raised when a comparison does not finish within the pool's timeout.'''
+
+
+def _init_worker(cache_dir, max_bytes, ttl, store_dir):
+    global _sessions, _store
+    fastf1.Cache.enable_cache(cache_dir)
+    _sessions = LRUCache(max_bytes, ttl=ttl, sizeof=estimate_session_bytes,
+                         name='worker sessions')
+    _store = TelemetryStore(store_dir) if store_dir else None
+
+
+def _load_worker_session(year, round, session_name):
+    session = load_session(year, round, session_name)
+    if _store is not None:
+        # ingesting is left to the server's ingest process, workers only read finished sessions
+        session.stored_telemetry = _store.open(
+            f"{year}-{round}-{session_name}", session)
+    return session
+
+
+def _run_comp(year, round, session_name, laps, x_axis, by_sector, comb_laps):
+    session = _sessions.get_or_load(f"{year}-{round}-{session_name}",
+                                    lambda: _load_worker_session(year, round, session_name))
+    resampled_tel, sector_dists = compare_session_laps(
+        session, laps, x_axis=x_axis, by_sector=by_sector, comb_laps=comb_laps)
+    # COMB laps attach averages to the session
+    _sessions.resize(f"{year}-{round}-{session_name}")
+    # plain dataframes, so the session attached to the telemetry isn't pickled with the result
+    return [pd.DataFrame(tel) for tel in resampled_tel], sector_dists
+
+
+def _load(year, round, session_name):
+    _sessions.get_or_load(f"{year}-{round}-{session_name}",
+                          lambda: _load_worker_session(year, round, session_name))
+
+
+class CompPool:
+    '''
+    Runs compare_session_laps in worker processes, so heavy comparisons run
+    in parallel instead of holding the GIL of the server process. Each worker
+    loads and caches the sessions it needs from the fastf1 cache.
+
+    A comparison goes to an idle worker that already holds its session, or
+    else to the least busy worker, which loads the session too. So a session
+    stays with one worker while that keeps up, and a busy session spreads
+    over more workers. The session is loaded before the comparison is
+    queued, so a cold load counts against load_timeout instead of timeout.
+
+    A timeout only stops waiting: a comparison or load that already started
+    keeps its worker and its queue slot until it finishes, and the worker
+    counts as busy until then, so new work goes to other workers.
+    '''
+
+    def __init__(self, workers, max_pending=8, timeout=120, load_timeout=300, cache_dir='./cache',
+                 max_bytes=512 * 1024 ** 2, ttl=None, store_dir=None):
+        '''
+        :param int workers: Number of worker processes
+        :param int max_pending: Number of comparisons that can wait for a free worker before new ones are refused, defaults to 8
+        :param float timeout: Seconds to wait for a comparison before giving up, defaults to 120
+        :param float load_timeout: Seconds to wait for a worker to load the session first, defaults to 300
+        :param str cache_dir: fastf1 cache directory used by the workers, defaults to './cache'
+        :param int max_bytes: Session cache budget of each worker, on top of the server's, defaults to 512 MB
+        :param float ttl: Seconds each worker keeps a session, defaults to None (until evicted)
+        :param str store_dir: Directory of the TelemetryStore the workers read from, defaults to None
+        '''
+        self.timeout = timeout
+        self.load_timeout = load_timeout
+        # one process per executor, so work can be sent to the worker holding the session
+        # spawn so workers don't inherit the server's threads and locks
+        self.executors = [ProcessPoolExecutor(1, mp_context=multiprocessing.get_context('spawn'),
+                                              initializer=_init_worker,
+                                              initargs=(os.path.abspath(cache_dir), max_bytes, ttl,
+                                                        store_dir and os.path.abspath(store_dir)))
+                          for _ in range(workers)]
+        self._slots = threading.BoundedSemaphore(workers + max_pending)
+        self._lock = threading.Lock()
+        # jobs queued or running on each worker
+        self._busy = [0] * workers
+        # workers that loaded each session, they may have evicted it since
+        self._holders = {}
+
+    def _pick_worker(self, key):
+        '''
+        :param str key: Session key
+        :return int: Index of an idle worker holding the session, or else of the least busy worker
+        '''
+        with self._lock:
+            holders = self._holders.get(key, set())
+            idle = [i for i in sorted(holders) if self._busy[i] == 0]
+            if idle:
+                return idle[0]
+            return min(range(len(self.executors)), key=lambda i: (self._busy[i], i not in holders))
+
+    def _submit(self, worker, fn, *args):
+        '''
+        Queues fn on a worker, holding a slot until it's done.
+        Raises CompPoolBusyError if the queue is full.
+        '''
+        if not self._slots.acquire(blocking=False):
+            raise CompPoolBusyError()
+        with self._lock:
+            self._busy[worker] += 1
+        try:
+            future = self.executors[worker].submit(fn, *args)
+        except BaseException:
+            self._done(worker)
+            raise
+
+        # the slot is held until the worker is done, even if the caller timed out
+        future.add_done_callback(lambda _f: self._done(worker))
+        return future
+
+    def _done(self, worker):
+        with self._lock:
+            self._busy[worker] -= 1
+        self._slots.release()
+
+    def _wait(self, future, timeout):
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            # only drops it if it hasn't started yet
+            future.cancel()
+            raise CompTimeoutError()
+
+    def load(self, year, round, session_name, worker=None):
+        '''
+        Queues loading a session into a worker's cache, if it isn't there.
+
+        :param int worker: Index of the worker, defaults to the one picked for the session
+        :return concurrent.futures.Future: Future that is done when the session is loaded
+        '''
+        key = f"{year}-{round}-{session_name}"
+        worker = self._pick_worker(key) if worker is None else worker
+        future = self._submit(worker, _load, year, round, session_name)
+
+        def loaded(f):
+            if not f.cancelled() and f.exception() is None:
+                with self._lock:
+                    self._holders.setdefault(key, set()).add(worker)
+        future.add_done_callback(loaded)
+        return future
+
+    def submit(self, year, round, session_name, laps, x_axis='Distance', by_sector=False, comb_laps=None,
+               worker=None):
+        '''
+        Queues a comparison. Raises CompPoolBusyError if the queue is full.
+
+        :param int worker: Index of the worker, defaults to the one picked for the session
+        :return concurrent.futures.Future: Future of the compare_session_laps result
+        '''
+        worker = self._pick_worker(f"{year}-{round}-{session_name}") if worker is None else worker
+        return self._submit(worker, _run_comp, year, round, session_name, laps, x_axis, by_sector, comb_laps)
+
+    def run(self, year, round, session_name, *args, **kwargs):
+        '''
+        Picks a worker, loads the session in it if needed, then runs a
+        comparison there and waits for the result. Takes the same arguments
+        as submit. Raises CompTimeoutError if the load takes longer than
+        load_timeout, or the comparison longer than timeout.
+
+        :return Tuple(List[pd.DataFrame], List[float]): resampled telemetry of each lap and sector distances
+        '''
+        key = f"{year}-{round}-{session_name}"
+        worker = self._pick_worker(key)
+        with self._lock:
+            loaded = worker in self._holders.get(key, ())
+        if not loaded:
+            self._wait(self.load(year, round, session_name, worker=worker), self.load_timeout)
+        return self._wait(self.submit(year, round, session_name, *args, worker=worker, **kwargs), self.timeout)
+
+    def shutdown(self):
+        for executor in self.executors:
+            executor.shutdown(wait=False, cancel_futures=True)
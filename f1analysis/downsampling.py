@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+
+
+def lttb_indices(x, ys, n_out):
+    '''
+    Picks the samples to keep with largest-triangle-three-buckets, for several
+    series sharing the same x values. In each bucket the sample kept is the
+    one making the largest triangle with the previous kept sample and the
+    average of the next bucket, in whichever series it is largest. Areas are
+    scaled by each series' range, so every series counts equally.
+
+    :param np.ndarray x: Shared x values, sorted
+    :param np.ndarray ys: Series values, shaped (number of series, len(x))
+    :param int n_out: Number of samples to keep, at least 3
+    :return np.ndarray: Sorted indices of the kept samples
+    '''
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype='float64')
+    ys = np.atleast_2d(np.asarray(ys, dtype='float64'))
+    ranges = np.nanmax(ys, axis=1) - np.nanmin(ys, axis=1)
+    ranges[~(ranges > 0)] = 1
+    ys = np.nan_to_num(ys / ranges[:, None])
+    # first and last samples are always kept, the rest is split into n_out - 2 buckets
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    kept = np.empty(n_out, dtype=int)
+    kept[0], kept[-1] = 0, n - 1
+    a = 0
+    for b in range(n_out - 2):
+        start, end = edges[b], edges[b + 1]
+        next_end = edges[b + 2] if b + 2 < len(edges) else n
+        avg_x = x[end:next_end].mean()
+        avg_y = ys[:, end:next_end].mean(axis=1)
+        areas = np.abs((x[a] - avg_x) * (ys[:, start:end] - ys[:, [a]]) -
+                       (x[a] - x[start:end]) * (avg_y - ys[:, a])[:, None])
+        a = start + int(areas.max(axis=0).argmax())
+        kept[b + 1] = a
+    return kept
+
+
+def channel_values(col):
+    '''
+    :param pd.Series col: Numeric, boolean, date or timedelta column
+    :return np.ndarray: Values as floats, dates and timedeltas in nanoseconds, NaN if missing
+    '''
+    if col.dtype.kind in 'mM':
+        values = col.to_numpy()
+        ns = values.view('int64').astype('float64')
+        ns[np.isnat(values)] = np.nan
+        return ns
+    return col.to_numpy(dtype='float64', na_value=np.nan)
+
+
+def downsample_laps(lap_tels, x_axis='Distance', max_points=None, precision=None):
+    '''
+    Reduces the resampled telemetry of compared laps for sending to the
+    client. Every lap keeps the same samples, chosen with lttb_indices over
+    all numeric channels of all laps, so laps can still be compared sample
+    by sample.
+
+    :param List[pd.DataFrame] lap_tels: Telemetry of each lap, with the same number of samples
+    :param str x_axis: Column the laps are aligned on, defaults to 'Distance'
+    :param int max_points: Number of samples to keep, defaults to None (keep all)
+    :param int precision: Number of decimals float channels are rounded to, defaults to None (no rounding)
+    :return List[pd.DataFrame]: Reduced telemetry of each lap
+    '''
+    if max_points is not None and len(lap_tels) > 0 and len(lap_tels[0]) > max_points:
+        series = [channel_values(tel[c]) for tel in lap_tels for c in tel.columns
+                  if c not in (x_axis, 'Distance', 'RelativeDistance') and tel[c].dtype.kind in 'fiubmM']
+        n = len(lap_tels[0])
+        if series:
+            keep = lttb_indices(lap_tels[0][x_axis].to_numpy(dtype='float64'),
+                                np.vstack(series), max_points)
+        else:
+            # nothing to pick samples by, so they're spread evenly
+            keep = np.unique(np.linspace(0, n - 1, max_points).round().astype(int))
+        lap_tels = [pd.DataFrame(tel).iloc[keep].reset_index(drop=True) for tel in lap_tels]
+    if precision is not None:
+        lap_tels = [tel.round({c: precision for c in tel.columns if tel[c].dtype.kind == 'f'})
+                    for tel in lap_tels]
+    return lap_tels
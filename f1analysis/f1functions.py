@@ -1,12 +1,17 @@
 import colorsys
+import threading
+from collections import OrderedDict
 
 import matplotlib as mpl
 import matplotlib.colors as mc
 import numpy as np
 import pandas as pd
 import seaborn as sns
+from fastf1.core import Laps, Telemetry
 from matplotlib import pyplot as plt
 from matplotlib.collections import LineCollection
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.interpolate import interp1d
 
 # VARIABLES
 races_so_far = 11
@@ -128,6 +133,39 @@ def timedelta_to_str(td):
     return f"{int(td.total_seconds()/60):02d}:{td.total_seconds()%60:06.3f}"
 
 
+def run_starts(df, cols):
+    '''
+    Run-length encodes the records of df on the values in cols.
+
+    :param pd.Dataframe df: Dataframe to encode
+    :param List[string] cols: List of column names to compare, missing values never equal each other
+    :return Tuple(np.ndarray, np.ndarray): Position of the first record of each run, and the number of records in each run
+    '''
+    changed = np.zeros(len(df), dtype=bool)
+    changed[:1] = True
+    for c in cols:
+        col = df[c]
+        if col.dtype.kind == 'O':
+            changed |= (col != col.shift()).to_numpy()
+        else:
+            values = col.to_numpy()
+            changed[1:] |= values[1:] != values[:-1]
+    starts = np.flatnonzero(changed)
+    return starts, np.diff(np.r_[starts, len(df)])
+
+
+def consecutive_ids(df, cols):
+    '''
+    Numbers the runs of consecutive records with same values in cols.
+
+    :param pd.Dataframe df: Dataframe to number
+    :param List[string] cols: List of column names to compare
+    :return np.ndarray: Number of the run of each record, starting at 0
+    '''
+    starts, lengths = run_starts(df, cols)
+    return np.repeat(np.arange(len(starts)), lengths)
+
+
 def group_consecutive(df, cols):
     '''
     Performs groupby only on consecutive records with same values in cols.
@@ -136,15 +174,131 @@ def group_consecutive(df, cols):
     :param List[string] cols: List of column names to group on
     :return pd.Groupby: groupby object that groups consecutively
     '''
-    group_seq = pd.Series(
-        zip(*(df[c] for c in cols))) if len(cols) > 1 else df[cols[0]]
-    return df.groupby(list((group_seq != group_seq.shift(1)).cumsum()))
+    return df.groupby(consecutive_ids(df, cols) + 1)
+
+
+def aggregate_runs(df, starts, aggs):
+    '''
+    Same as group_consecutive(...).agg(aggs) on the runs found by run_starts,
+    computed with reduceat over the column arrays. Aggregations are 'first'
+    and 'last' (skipping missing values), 'mean', 'min', 'max' and 'sum', or
+    functions taking (values, starts, ends) that return a value per run.
+
+    :param pd.Dataframe df: Dataframe to aggregate
+    :param np.ndarray starts: Position of the first record of each run
+    :param dict aggs: Aggregations of each column, a name, function or list of them
+    :return pd.Dataframe: Dataframe with (column, aggregation) columns, indexed by run number from 1
+    '''
+    ends = np.r_[starts[1:], len(df)][:len(starts)] - 1
+    positions = np.arange(len(df))
+    result = {}
+    for col, col_aggs in aggs.items():
+        values = df[col].to_numpy()
+        missing = pd.isna(values)
+        for agg in col_aggs if isinstance(col_aggs, list) else [col_aggs]:
+            if callable(agg):
+                result[(col, agg.__name__)] = agg(values, starts, ends)
+            elif agg in ('first', 'last'):
+                # position of the first (or last) value that isn't missing in each run
+                if agg == 'first':
+                    pos = np.minimum.accumulate(np.where(missing, len(df), positions)[::-1])[::-1][starts]
+                    found = pos <= ends
+                else:
+                    pos = np.maximum.accumulate(np.where(missing, -1, positions))[ends]
+                    found = pos >= starts
+                picked = pd.Series(values[np.clip(pos, 0, max(len(df) - 1, 0))])
+                result[(col, agg)] = picked if found.all() else picked.where(found)
+            else:
+                floats = np.where(missing, 0, values).astype('float64')
+                counts = np.add.reduceat(~missing, starts)
+                if agg in ('sum', 'mean'):
+                    sums = np.add.reduceat(floats, starts)
+                    result[(col, agg)] = sums if agg == 'sum' else np.divide(
+                        sums, counts, out=np.full(len(starts), np.nan), where=counts > 0)
+                else:
+                    fill = np.inf if agg == 'min' else -np.inf
+                    reduced = (np.minimum if agg == 'min' else np.maximum).reduceat(
+                        np.where(missing, fill, values.astype('float64')), starts)
+                    result[(col, agg)] = np.where(counts > 0, reduced, np.nan)
+    return pd.DataFrame({k: np.asarray(v) if not isinstance(v, pd.Series) else v.to_numpy()
+                         for k, v in result.items()}, index=np.arange(1, len(starts) + 1))
+
+
+def window_positions(values, starts, ends, groups=None, window_groups=None):
+    '''
+    Finds the records whose value is within each of many [start, end]
+    windows, with one searchsorted over the sorted values instead of a mask
+    per window. Records and windows can be split into groups, so a window
+    only gets the records of its group. Missing values are in no window.
+
+    :param array-like values: Value of each record, like its SessionTime
+    :param array-like starts: First value of each window
+    :param array-like ends: Last value of each window
+    :param array-like groups: Group of each record, like its LapNumber, defaults to None
+    :param array-like window_groups: Group of each window, needed with groups, defaults to None
+    :return Tuple(np.ndarray, np.ndarray): Positions of the records in each window, in the order of values, and the window of each
+    '''
+    def as_numbers(arr):
+        # timedeltas and dates are compared as integer nanoseconds, so group offsets stay exact
+        arr = np.asarray(arr)
+        if arr.dtype.kind in 'mM':
+            arr = arr.astype(f"{arr.dtype.str[1:3]}[ns]")
+            return arr.view('int64'), ~np.isnat(arr)
+        arr = arr.astype('float64')
+        return arr, ~np.isnan(arr)
+
+    (values, valid), (starts, valid_starts), (ends, valid_ends) = map(as_numbers, (values, starts, ends))
+    window_valid = valid_starts & valid_ends
+    if groups is not None:
+        # each group gets its own stretch of values, further apart than any window is long
+        codes, _uniques = pd.factorize(np.concatenate([np.asarray(groups), np.asarray(window_groups)]))
+        codes, window_codes = codes[:len(values)], codes[len(values):]
+        valid &= codes >= 0
+        window_valid &= window_codes >= 0
+        bounds = np.r_[values[valid], starts[window_valid], ends[window_valid]]
+        low = bounds.min() if len(bounds) else 0
+        spacing = bounds.max() - low + 1 if len(bounds) else 1
+        values = (values - low) + codes * spacing
+        starts = (starts - low) + window_codes * spacing
+        ends = (ends - low) + window_codes * spacing
+    record_pos = np.flatnonzero(valid)
+    order = record_pos[np.argsort(values[valid], kind='stable')]
+    sorted_values = values[order]
+    lo = np.searchsorted(sorted_values, starts[window_valid], side='left')
+    counts = np.zeros(len(starts), dtype=int)
+    counts[window_valid] = np.maximum(np.searchsorted(sorted_values, ends[window_valid], side='right') - lo, 0)
+    window = np.repeat(np.arange(len(starts)), counts)
+    first = np.zeros(len(starts), dtype=int)
+    first[window_valid] = lo
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    positions = order[np.repeat(first, counts) + offsets]
+    # records of each window back in their original order
+    resort = np.lexsort((positions, window))
+    return positions[resort], window[resort]
+
 
 ### GENERAL FASTF1 FUNCTIONS ###
 
 
+def get_lap_telemetry(lap):
+    '''
+    Gets the merged telemetry of a lap. Reads it from the session's telemetry
+    store if one was attached when the session was loaded (see
+    telemetry_store.TelemetryStore.attach), otherwise calls lap.get_telemetry().
+
+    :param fastf1.core.Lap lap: Lap to get telemetry for
+    :return fastf1.core.Telemetry: Telemetry of the lap
+    '''
+    stored = getattr(getattr(lap, 'session', None), 'stored_telemetry', None)
+    if stored is not None:
+        tel = stored.get_lap(lap['Driver'], lap['LapNumber'])
+        if tel is not None:
+            return tel
+    return lap.get_telemetry()
+
+
 def get_lap_data(orig_laps, which='car', add_distance=True, add_relative_distance=False,
-                 add_driver_ahead=False, add_columns=None, **kwargs):
+                 add_driver_ahead=False, add_columns=None, batch=False, **kwargs):
     '''
     Gets all telemetry information about each lap in orig_laps. Adds distance or 
     relative distance for this lap only, adds additional columns for all 
@@ -156,15 +310,21 @@ def get_lap_data(orig_laps, which='car', add_distance=True, add_relative_distanc
     :param bool add_relative_distance: If should call add relative distance on each lap, defaults to False
     :param bool add_driver_ahead: If should call add driver ahead on each lap, defaults to False
     :param List[string] add_columns: Strings containing names of columns in laps to add to each row of telemetry, defaults to None
+    :param bool batch: If should use get_lap_data_batch, which gives the same result much faster for many laps, defaults to False.
+        Ignored when kwargs or add_driver_ahead are given.
     :return pd.Dataframe: A dataframe with all telemetry data from the laps.
     '''
-    new_laps = pd.DataFrame()
+    if batch and not kwargs and not add_driver_ahead and getattr(orig_laps, 'session', None) is not None:
+        return get_lap_data_batch(orig_laps, which=which, add_distance=add_distance,
+                                  add_relative_distance=add_relative_distance, add_columns=add_columns)
+    new_laps = []
     for i, row in orig_laps.iterrows():  # for i in lap_nums
         cur_lap = row
         if which == 'car':
             cur_lap = cur_lap.get_car_data(**kwargs)
         elif which == 'tel' or which == 'telemetry':
-            cur_lap = cur_lap.get_telemetry(**kwargs)
+            cur_lap = cur_lap.get_telemetry(
+                **kwargs) if kwargs else get_lap_telemetry(cur_lap)
         elif which == 'pos':
             cur_lap = cur_lap.get_pos_data(**kwargs)
         else:
@@ -180,7 +340,85 @@ def get_lap_data(orig_laps, which='car', add_distance=True, add_relative_distanc
                 cur_lap[col] = row[col]
         cur_lap['LapNumber'] = row['LapNumber']
         cur_lap['Driver'] = row['Driver']
-        new_laps = pd.concat([new_laps, cur_lap], ignore_index=True)
+        new_laps.append(cur_lap)
+    return pd.concat(new_laps, ignore_index=True) if new_laps else pd.DataFrame()
+
+
+def slice_laps(data, laps):
+    '''
+    Slices the session-wide data of one driver into laps at once, the same as
+    calling slice_by_lap on each lap. Finds each lap's samples with a binary
+    search over SessionTime instead of comparing every sample for every lap.
+
+    :param fastf1.core.Telemetry data: Car or position data of the whole session, sorted by SessionTime
+    :param fastf1.core.Laps laps: Laps of the same driver
+    :return Tuple(fastf1.core.Telemetry, np.ndarray): Samples of all laps with Time counted from each lap's start,
+        and the position in laps of each sample's lap
+    '''
+    session_times = data['SessionTime'].to_numpy()
+    lap_starts, lap_ends = laps['LapStartTime'].to_numpy(), laps['Time'].to_numpy()
+    starts = np.searchsorted(session_times, lap_starts, side='left')
+    ends = np.searchsorted(session_times, lap_ends, side='right')
+    lengths = np.where(np.isnat(lap_starts) | np.isnat(lap_ends), 0, np.maximum(ends - starts, 0))
+    lap_pos = np.repeat(np.arange(len(laps)), lengths)
+    # index of every selected sample: each lap's start, plus the sample's position within its lap
+    sample_idx = starts[lap_pos] + np.arange(len(lap_pos)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    sliced = data.iloc[sample_idx].reset_index(drop=True)
+    if 'Time' in sliced.columns:
+        sliced['Time'] = session_times[sample_idx] - lap_starts[lap_pos]
+    return sliced, lap_pos
+
+
+def get_lap_data_batch(orig_laps, which='car', add_distance=True, add_relative_distance=False, add_columns=None):
+    '''
+    Same as get_lap_data, but handles all laps together. Car and position data
+    are sliced from each driver's session-wide data with slice_laps, distances
+    are integrated for every lap at once, and the result is built with a
+    single concatenation.
+
+    :param fastf1.core.Laps orig_laps: Laps object with all laps to get, with its session set.
+    :param string which: 'car' to get car data, 'pos' for position data, 'tel' or 'telemetry' to get telemetry
+    :param bool add_distance: If should add the distance driven in each lap, defaults to True
+    :param bool add_relative_distance: If should add the relative distance of each lap, defaults to False
+    :param List[string] add_columns: Strings containing names of columns in laps to add to each row of telemetry, defaults to None
+    :return pd.Dataframe: A dataframe with all telemetry data from the laps.
+    '''
+    if which not in ('car', 'pos', 'tel', 'telemetry'):
+        return
+    if len(orig_laps) == 0:
+        return pd.DataFrame()
+    orig_laps = orig_laps.reset_index(drop=True)
+    parts, part_pos = [], []
+    if which in ('car', 'pos'):
+        session_data = orig_laps.session.car_data if which == 'car' else orig_laps.session.pos_data
+        for drv_num, drv_laps in orig_laps.groupby('DriverNumber', sort=False):
+            sliced, lap_pos = slice_laps(session_data[drv_num], drv_laps)
+            parts.append(sliced)
+            part_pos.append(drv_laps.index.to_numpy()[lap_pos])
+    else:
+        for i, lap in orig_laps.iterlaps():
+            tel = get_lap_telemetry(lap)
+            parts.append(tel)
+            part_pos.append(np.full(len(tel), i))
+    lap_pos = np.concatenate(part_pos)
+    # samples of each lap stay together, in the order of orig_laps
+    order = np.argsort(lap_pos, kind='stable')
+    new_laps = pd.concat(parts, ignore_index=True).iloc[order].reset_index(drop=True)
+    lap_pos = lap_pos[order]
+    if add_distance or add_relative_distance:
+        # same integration as Telemetry.add_distance, restarted at every lap
+        dt = new_laps['Time'].dt.total_seconds().to_numpy()
+        new_lap_start = np.r_[True, lap_pos[1:] != lap_pos[:-1]]
+        dt = np.where(new_lap_start, dt, dt - np.r_[0, dt[:-1]])
+        dist = pd.Series(new_laps['Speed'].to_numpy() / 3.6 * dt).groupby(lap_pos).cumsum()
+        if add_distance:
+            new_laps = new_laps.drop(columns='Distance', errors='ignore')
+            new_laps['Distance'] = dist.to_numpy()
+        if add_relative_distance:
+            new_laps = new_laps.drop(columns='RelativeDistance', errors='ignore')
+            new_laps['RelativeDistance'] = (dist / dist.groupby(lap_pos).transform('last')).to_numpy()
+    for col in (add_columns or []) + ['LapNumber', 'Driver']:
+        new_laps[col] = orig_laps[col].to_numpy()[lap_pos]
     return new_laps
 
 
@@ -323,34 +561,84 @@ def compare_lap_time_accurately(lap1, lap2, lap1data=None, lap2data=None):
     return lap_comparison
 
 
+def interpolate_laps(lap_datas, x_col, y_col, queries):
+    '''
+    Interpolates y_col at values of x_col for many laps at once, like
+    inserting the queries into each lap and interpolating, but without
+    copying or changing the telemetry. Queries before the first sample of a
+    lap are NaN, those after its last sample get its last value.
+
+    :param List[pd.DataFrame] lap_datas: Telemetry of each lap
+    :param str x_col: Column the queries are values of, like 'Time' or 'Distance'
+    :param str y_col: Column to interpolate
+    :param List[array-like] queries: Values of x_col to look up in each lap, timedeltas for timedelta columns
+    :return List[np.ndarray]: Values of y_col at the queries of each lap, timedelta64 for timedelta columns
+    '''
+    def as_float(values):
+        # timedeltas are interpolated as nanoseconds
+        if values.dtype.kind == 'm':
+            ns = values.astype('timedelta64[ns]')
+            return np.where(np.isnat(ns), np.nan, ns.view('int64').astype('float64'))
+        return values.astype('float64')
+
+    results = []
+    for lap_data, query in zip(lap_datas, queries):
+        # columns of a plain dataframe are much cheaper to get than those of a Telemetry
+        frame = pd.DataFrame(lap_data, copy=False)
+        x, y = frame[x_col].to_numpy(), frame[y_col].to_numpy()
+        query = np.atleast_1d(pd.to_timedelta(query).to_numpy() if x.dtype.kind == 'm' else np.asarray(query))
+        x, new_y, query = as_float(x), as_float(y), as_float(query)
+        valid = ~np.isnan(x) & ~np.isnan(new_y)
+        x, new_y = x[valid], new_y[valid]
+        if (np.diff(x) < 0).any():
+            order = np.argsort(x, kind='stable')
+            x, new_y = x[order], new_y[order]
+        values = np.interp(query, x, new_y, left=np.nan) if len(x) else np.full(len(query), np.nan)
+        if y.dtype.kind == 'm':
+            # NaN becomes NaT, which is the smallest int64
+            values = np.where(np.isnan(values), np.iinfo('int64').min, np.rint(values)).astype('int64') \
+                .view('timedelta64[ns]')
+        results.append(values)
+    return results
+
+
+def get_distances_at_times(lap_datas, times, relative=False):
+    '''
+    :param List[pd.DataFrame] lap_datas: Telemetry of each lap, with Time and Distance (or RelativeDistance)
+    :param List[array-like] times: Times since the start of the lap to look up in each lap
+    :param bool relative: If should get RelativeDistance instead of Distance, defaults to False
+    :return List[np.ndarray]: Distances of each lap at its times
+    '''
+    return interpolate_laps(lap_datas, 'Time', 'Distance' if not relative else 'RelativeDistance', times)
+
+
+def get_times_at_distances(lap_datas, distances, relative=False, sessiontime=False):
+    '''
+    :param List[pd.DataFrame] lap_datas: Telemetry of each lap, with Distance (or RelativeDistance) and Time
+    :param List[array-like] distances: Distances to look up in each lap
+    :param bool relative: If the distances are relative, laps without RelativeDistance are scaled by their total distance, defaults to False
+    :param bool sessiontime: If should get SessionTime instead of Time, defaults to False
+    :return List[np.ndarray]: Times (timedelta64) of each lap at its distances
+    '''
+    time_col = 'Time' if not sessiontime else 'SessionTime'
+    if not relative:
+        return interpolate_laps(lap_datas, 'Distance', time_col, distances)
+    # laps without RelativeDistance are looked up by their share of the total distance
+    return [interpolate_laps([lap_data], 'RelativeDistance', time_col, [d])[0] if 'RelativeDistance' in lap_data.columns
+            else interpolate_laps([lap_data], 'Distance', time_col,
+                                  [np.asarray(d, dtype='float64') * lap_data['Distance'].iloc[-1]])[0]
+            for lap_data, d in zip(lap_datas, distances)]
+
+
 def get_distance_from_time(lap_data, time, relative=False):
-    dist_col = 'Distance' if not relative else 'RelativeDistance'
-    lap_data = lap_data.set_index('Time')
-    try:
-        for t in time:
-            if t not in lap_data.index:
-                lap_data.loc[t, dist_col] = np.nan
-    except TypeError:
-        lap_data.loc[time, dist_col] = np.nan
-    lap_data.sort_index(inplace=True)
-    return lap_data.Distance.interpolate('time')[time]
+    distances = get_distances_at_times([lap_data], [time], relative=relative)[0]
+    return pd.Series(distances, index=time) if pd.api.types.is_list_like(time) else distances[0]
 
 
 def get_time_from_distance(lap_data, distance, relative=False, sessiontime=False):
-    time_col = 'Time' if not sessiontime else 'SessionTime'
-    if relative and 'RelativeDistance' not in lap_data.columns:
-        distance = distance * lap_data.Distance.iloc[-1]
-        relative = False
-    lap_data = lap_data.set_index(
-        'Distance' if not relative else 'RelativeDistance')
-    try:
-        for d in distance:
-            if d not in lap_data.index:
-                lap_data.loc[d, time_col] = np.nan
-    except TypeError:
-        lap_data.loc[distance, time_col] = np.nan
-    lap_data.sort_index(inplace=True)
-    return interpolate_times(lap_data[time_col])[distance]
+    times = pd.to_timedelta(get_times_at_distances(
+        [lap_data], [distance], relative=relative, sessiontime=sessiontime)[0])
+    return pd.Series(times, index=distance) if pd.api.types.is_list_like(distance) else times[0]
 
 ### FASTF1 DIVIDE TRACK FUNCTIONS ###
 
@@ -392,14 +680,15 @@ def get_twitter_sectors(col, num_minisectors=25):
     minisectors = [0]
     for i in range(0, (num_minisectors - 1)):
         minisectors.append(minisector_length * (i + 1))
+    minisectors = np.array(minisectors)
 
-    # Return minisector of every row in the telemetry data
-    return col.apply(
-        lambda z: (
-            minisectors.index(
-                min(minisectors, key=lambda x: abs(x-z)))+1
-        )
-    )
+    # Return minisector of every row in the telemetry data: the closest start, the first one on ties
+    z = col.to_numpy()
+    above = np.clip(np.searchsorted(minisectors, z), 1, len(minisectors) - 1)
+    below = above - 1
+    closest = np.where(np.abs(minisectors[below] - z) <= np.abs(minisectors[above] - z), below, above) \
+        if len(minisectors) > 1 else np.zeros(len(z), dtype=int)
+    return pd.Series(closest + 1, index=col.index)
 
 
 def get_sector_time_list(df, sectors, first_time=None, last_time=None):
@@ -435,6 +724,76 @@ def get_sector_times(lap, laptel=None, sectors=25):
     return times
 
 
+def get_minisector_times(laps_data, lap_times, num_minisectors=25):
+    '''
+    Gets the time spent in each minisector of many laps at once. Each lap is
+    divided into num_minisectors equal parts of RelativeDistance and the time
+    at every boundary is interpolated like get_sector_time_list does, with
+    the lap starting at 0 and ending at its lap time.
+
+    :param pd.DataFrame laps_data: Telemetry of the laps with Driver, LapNumber, Time and RelativeDistance, like get_lap_data returns
+    :param pd.Series lap_times: LapTime of each lap, indexed by (Driver, LapNumber)
+    :param int num_minisectors: Number of minisectors, defaults to 25
+    :return pd.DataFrame: Seconds spent in each minisector (columns 1 to num_minisectors), indexed by (Driver, LapNumber)
+    '''
+    laps_data = laps_data[laps_data['RelativeDistance'].notna() & laps_data['Time'].notna()]
+    lap_id = consecutive_ids(laps_data, ['Driver', 'LapNumber'])
+    lap_keys = laps_data[['Driver', 'LapNumber']][np.r_[True, lap_id[1:] != lap_id[:-1]]]
+    rel = laps_data['RelativeDistance'].to_numpy(dtype='float64')
+    times = laps_data['Time'].dt.total_seconds().to_numpy()
+    # laps are kept apart by adding twice the lap's number to its relative distances, which are between 0 and 1
+    order = np.lexsort((rel, lap_id))
+    key, times, lap_id = (lap_id * 2 + rel)[order], times[order], lap_id[order]
+    lap_first = np.searchsorted(lap_id, np.arange(len(lap_keys)), side='left')
+    lap_last = np.searchsorted(lap_id, np.arange(len(lap_keys)), side='right') - 1
+    bounds = np.arange(num_minisectors + 1) / num_minisectors
+    query = (np.arange(len(lap_keys))[:, None] * 2 + bounds).ravel()
+    first, last = np.repeat(lap_first, len(bounds)), np.repeat(lap_last, len(bounds))
+    hi = np.clip(np.searchsorted(key, query, side='right'), first, last)
+    lo = np.clip(hi - 1, first, last)
+    span = key[hi] - key[lo]
+    weight = np.where(span > 0, (query - key[lo]) / np.where(span > 0, span, 1), 0)
+    bound_times = (times[lo] + np.clip(weight, 0, 1) * (times[hi] - times[lo])).reshape(len(lap_keys), len(bounds))
+    index = pd.MultiIndex.from_frame(lap_keys.reset_index(drop=True))
+    bound_times[:, 0] = 0
+    bound_times[:, -1] = lap_times.reindex(index).dt.total_seconds().to_numpy()
+    return pd.DataFrame(np.diff(bound_times, axis=1), index=index, columns=np.arange(1, num_minisectors + 1))
+
+
+# numbers of minisectors whose times are kept on each session
+minisector_times_per_session = 4
+_minisector_times_lock = threading.Lock()
+
+
+def get_session_minisector_times(session, num_minisectors=25):
+    '''
+    Gets the minisector times of every timed lap of a session with
+    get_minisector_times, using the car data of the laps. Results are kept
+    on the session for the last minisector_times_per_session numbers of
+    minisectors used.
+
+    :param fastf1.core.Session session: Loaded session
+    :param int num_minisectors: Number of minisectors, defaults to 25
+    :return pd.DataFrame: Seconds spent in each minisector (columns 1 to num_minisectors), indexed by (Driver, LapNumber)
+    '''
+    with _minisector_times_lock:
+        if getattr(session, 'minisector_times', None) is None:
+            session.minisector_times = OrderedDict()
+        if num_minisectors in session.minisector_times:
+            session.minisector_times.move_to_end(num_minisectors)
+            return session.minisector_times[num_minisectors]
+    laps = session.laps[session.laps['LapTime'].notna()]
+    laps_data = get_lap_data(laps, which='car', add_distance=False,
+                             add_relative_distance=True, batch=True)
+    lap_times = laps.set_index(['Driver', 'LapNumber'])['LapTime']
+    times = get_minisector_times(laps_data, lap_times, num_minisectors)
+    with _minisector_times_lock:
+        session.minisector_times[num_minisectors] = times
+        while len(session.minisector_times) > minisector_times_per_session:
+            session.minisector_times.popitem(last=False)
+    return times
+
+
 ### FLAT OUT FASTF1 FUNCTIONS ###
 
 def get_straight(laps, i=0):
@@ -447,23 +806,46 @@ def get_straight(laps, i=0):
     :return: pd.Dataframe of the i-th longest straight for each lap
     ::note:: this may cause issues because of straights that cross over laps
     '''
-    grouped = group_consecutive(
-        laps, ['nGear', 'Throttle', 'Brake']).agg(['first', 'last'])
+    starts, _lengths = run_starts(laps, ['nGear', 'Throttle', 'Brake'])
+    grouped = aggregate_runs(laps, starts, {'Distance': ['first', 'last'], 'LapNumber': 'first',
+                                            'Time': ['first', 'last']})
     grouped.loc[:, ('Distance', 'Difference')
                 ] = grouped['Distance']['last'] - grouped['Distance']['first']
     grouped.sort_values([('Distance', 'Difference')],
                         ascending=False, inplace=True)
 
-    straights = pd.DataFrame()
-    for ln in laps['LapNumber'].unique():
-        start_time, end_time = grouped.loc[grouped[(
-            'LapNumber', 'first')] == ln].iloc[i].Time
-        straight = laps[(laps.LapNumber == ln) & (laps.Time >= start_time) & (
-            laps.Time <= end_time)].copy(deep=True)
-        straight['Time'] -= straight.iloc[0].Time
-        straight['DRSUsed'] = any(straight.DRS == 12)
-        straights = pd.concat([straights, straight], ignore_index=True)
-    return straights
+    # i-th longest straight of each lap, in the order laps first appear
+    lap_numbers = laps['LapNumber'].unique()
+    picked = grouped[grouped.groupby(('LapNumber', 'first'), sort=False).cumcount().to_numpy() == i] \
+        .set_index(('LapNumber', 'first')).reindex(lap_numbers)
+    if picked[('Time', 'first')].isna().any():
+        raise IndexError(f"Not every lap has a straight number {i}")
+    positions, window = window_positions(laps['Time'], picked[('Time', 'first')], picked[('Time', 'last')],
+                                         laps['LapNumber'], lap_numbers)
+    return extract_windows(laps, positions, window, time_adjust=True, add_drs_used=True)
+
+
+def extract_windows(laps, positions, window, time_adjust=True, add_drs_used=False):
+    '''
+    Gathers the records of many windows found with window_positions.
+
+    :param pd.Dataframe laps: Telemetry the windows are in
+    :param np.ndarray positions: Position of each record of the windows
+    :param np.ndarray window: Window of each record
+    :param bool time_adjust: If Time should start at 0 in each window, defaults to True
+    :param bool add_drs_used: If should add DRSUsed, whether any DRS value in the window is 12, defaults to False
+    :return pd.Dataframe: Records of every window one after the other
+    '''
+    windows = laps.iloc[positions].reset_index(drop=True)
+    window_start = np.flatnonzero(np.r_[True, window[1:] != window[:-1]]) if len(window) else np.array([], dtype=int)
+    window_length = np.diff(np.r_[window_start, len(window)])
+    if time_adjust:
+        times = windows['Time'].to_numpy()
+        windows['Time'] = times - np.repeat(times[window_start], window_length)
+    if add_drs_used:
+        windows['DRSUsed'] = np.repeat(np.logical_or.reduceat(
+            windows['DRS'].to_numpy() == 12, window_start), window_length)
+    return windows
 
 
 def get_flat_out_overview(laps_data, crit=['LapNumber', 'nGear']):
@@ -477,16 +859,16 @@ def get_flat_out_overview(laps_data, crit=['LapNumber', 'nGear']):
     :param list crit: criteria to groupby, defaults to ['LapNumber', 'nGear']
     :return pd.Dataframe: Dataframe with summary of important characteristics
     '''
-    def used(x):
-        return any(i == 12 for i in x)
+    def used(drs, starts, ends):
+        return np.logical_or.reduceat(drs == 12, starts)
 
-    def total(dists):
-        res = dists.iloc[-1] - dists.iloc[0]
-        if dists.iloc[0] <= dists.iloc[-1]:
-            return res
-        return max(dists) + res
+    def total(dists, starts, ends):
+        # distance covered, also when a section crosses the finish line
+        res = dists[ends] - dists[starts]
+        return np.where(dists[starts] <= dists[ends], res, np.maximum.reduceat(dists, starts) + res)
 
-    grouped = group_consecutive(laps_data, ['Throttle', 'Brake'] + crit).agg({
+    starts, _lengths = run_starts(laps_data, ['Throttle', 'Brake'] + crit)
+    grouped = aggregate_runs(laps_data, starts, {
         'RPM': ['first', 'last', 'mean'],
         'Speed': ['first', 'last', 'mean'],
         'nGear': ['first', 'last'],
@@ -508,16 +890,10 @@ def get_flat_out(laps, sections, time_adjust=True):
     '''Goes through each row in sections and gets data in laps between 
     ('SessionTime', 'first') and ('SessionTime', 'last').
     If time adjust, makes time based on first sample of data in section.'''
-    straights = pd.DataFrame()
-    for i, row in sections.iterrows():
-        start_time, end_time = row[(
-            'SessionTime', 'first')], row[('SessionTime', 'last')]
-        straight = laps[(laps.SessionTime >= start_time) & (
-            laps.SessionTime <= end_time)].copy(deep=True)
-        if time_adjust:
-            straight['Time'] -= straight.iloc[0].Time
-        straight['Group'] = i
-        straights = pd.concat([straights, straight], ignore_index=True)
+    positions, window = window_positions(laps['SessionTime'], sections[('SessionTime', 'first')],
+                                         sections[('SessionTime', 'last')])
+    straights = extract_windows(laps, positions, window, time_adjust=time_adjust)
+    straights['Group'] = sections.index.to_numpy()[window]
     return straights
 
 
@@ -536,8 +912,8 @@ def withinstddev(col):
 def select_flat_outs(laps_data, top=10, drs=False, limit_std_dev=False):
     ''' Unused function to select flat outs within a standard deviation.'''
     flat_outs = get_flat_out_overview(laps_data)
-    drs_selector = flat_outs[('DRS', 'any_drs')
-                             ] if drs else ~flat_outs[('DRS', 'any_drs')]
+    drs_selector = flat_outs[('DRS', 'used')
+                             ] if drs else ~flat_outs[('DRS', 'used')]
     selected_flat_outs = flat_outs[drs_selector].iloc[:top]
     if limit_std_dev:
         selected_flat_outs = selected_flat_outs[withinstddev(selected_flat_outs[(
@@ -714,27 +1090,7 @@ def separate_colors(color1, color2, hadj=0.125):
 
 
 def average_lap_tel(lap_data, rolling=True):
-    comb_driver = ''.join(lap_data.Driver.unique())
-    comb_driver_ahead = ''.join(lap_data.DriverAhead.unique())
-    lap_data.sort_values('RelativeDistance', inplace=True)
-    section_num = pd.cut(lap_data.RelativeDistance,
-                         np.linspace(0, 1, 300), labels=False)
-    section_num.loc[lap_data.drop_duplicates(
-        ['Driver', 'LapNumber']).index] -= 1
-    section_num.loc[lap_data.drop_duplicates(
-        ['Driver', 'LapNumber'], keep='last').index] += 1
-    lap_data.drop(['Source', 'Driver', 'DriverAhead',
-                  'Status'], axis=1, inplace=True)
-    avg_lap = lap_data.groupby(section_num).mean(numeric_only=False).reset_index(
-        drop=True)  # around 300 samples in a standard lap
-    if rolling:
-        new_avg_lap = avg_lap.drop(['Date', 'SessionTime', 'Time'], axis=1)
-        avg_lap[new_avg_lap.columns] = new_avg_lap.rolling(
-            window=5, min_periods=1, center=True).mean()
-    avg_lap['Source'] = 'average'
-    avg_lap['Driver'] = comb_driver
-    avg_lap['DriverAhead'] = comb_driver_ahead
-    return avg_lap
+    return LapAverage(session=getattr(lap_data, 'session', None)).add(lap_data).get_telemetry(rolling=rolling)
 
 
 def average_lap(laps):
@@ -744,6 +1100,235 @@ def average_lap(laps):
     return pd.concat([new_lap, non_num])
 
 
+class LapAverage:
+    '''
+    Average telemetry of a set of laps, like average_lap_tel, kept as the sum
+    and count of every channel in each section of a RelativeDistance grid.
+    Laps can be added and removed without going through the others again.
+    '''
+    # columns average_lap_tel drops, and the ones it doesn't smooth
+    text_columns = ['Source', 'Driver', 'DriverAhead', 'Status']
+    time_columns = ['Date', 'SessionTime', 'Time']
+
+    def __init__(self, session=None, num_sections=300):
+        '''
+        :param fastf1.core.Session session: Session of the laps, used to get the telemetry of new laps and set on the average, defaults to None
+        :param int num_sections: Number of edges of the grid, like np.linspace(0, 1, num_sections), defaults to 300
+        '''
+        self.session = session
+        self.edges = np.linspace(0, 1, num_sections)
+        # grid sections, plus one before and after for the first and last sample of each lap
+        self.num_slots = num_sections + 1
+        self.laps = {}
+        self.columns = None
+        self.lock = threading.RLock()
+
+    def add(self, lap_data):
+        '''
+        Adds laps to the average. Laps already in it are replaced.
+
+        :param pd.DataFrame lap_data: Telemetry of the laps, with Driver, LapNumber and RelativeDistance, like get_lap_data returns
+        :return LapAverage: self
+        '''
+        frame = pd.DataFrame(lap_data, copy=False)
+        if len(frame) == 0:
+            return self
+        lap_id = consecutive_ids(frame, ['Driver', 'LapNumber'])
+        lap_keys = list(frame[['Driver', 'LapNumber']][np.r_[True, lap_id[1:] != lap_id[:-1]]]
+                        .itertuples(index=False, name=None))
+        with self.lock:
+            if self.columns is None:
+                self.columns = [(c, frame[c].dtype) for c in frame.columns
+                                if c not in self.text_columns and frame[c].dtype.kind in 'fiubmM']
+                self.date_ref = frame['Date'].iloc[0] if 'Date' in frame.columns else None
+                self.sums = np.zeros((len(self.columns), self.num_slots))
+                self.counts = np.zeros((len(self.columns), self.num_slots), dtype=int)
+                self.samples = np.zeros(self.num_slots, dtype=int)
+            # same sections as pd.cut, with the first sample of each lap moved to the
+            # previous section and the last one to the next
+            rel = frame['RelativeDistance'].to_numpy(dtype='float64')
+            section = np.searchsorted(self.edges, rel, side='left') - 1
+            valid = (section >= 0) & (section < len(self.edges) - 1)
+            order = np.lexsort((rel, lap_id))
+            lap_start = np.r_[True, lap_id[order][1:] != lap_id[order][:-1]]
+            section[order[lap_start]] -= 1
+            section[order[np.r_[lap_start[1:], True]]] += 1
+            slot = (lap_id * self.num_slots + section + 1)[valid]
+            size = len(lap_keys) * self.num_slots
+            samples = np.bincount(slot, minlength=size).reshape(len(lap_keys), self.num_slots)
+            sums = np.zeros((len(lap_keys), len(self.columns), self.num_slots))
+            counts = np.zeros((len(lap_keys), len(self.columns), self.num_slots), dtype=int)
+            for i, (col, _dtype) in enumerate(self.columns):
+                if col not in frame.columns:
+                    continue
+                values = self._values(frame[col])[valid]
+                has_value = ~np.isnan(values)
+                sums[:, i] = np.bincount(slot[has_value], weights=values[has_value],
+                                         minlength=size).reshape(len(lap_keys), self.num_slots)
+                counts[:, i] = np.bincount(slot[has_value], minlength=size).reshape(len(lap_keys), self.num_slots)
+            drivers_ahead = frame['DriverAhead'].to_numpy() if 'DriverAhead' in frame.columns else None
+            for j, key in enumerate(lap_keys):
+                self._remove(key)
+                self.laps[key] = {'sums': sums[j], 'counts': counts[j], 'samples': samples[j],
+                                  'drivers_ahead': [] if drivers_ahead is None else
+                                  list(pd.unique(drivers_ahead[lap_id == j]))}
+                self.sums += sums[j]
+                self.counts += counts[j]
+                self.samples += samples[j]
+        return self
+
+    def remove(self, driver, lap_number):
+        '''
+        Removes a lap from the average, if it's in it.
+
+        :param str driver: Driver of the lap
+        :param float lap_number: Number of the lap
+        :return LapAverage: self
+        '''
+        with self.lock:
+            self._remove((driver, lap_number))
+        return self
+
+    def _remove(self, key):
+        lap = self.laps.pop(key, None)
+        if lap is None:
+            return
+        self.sums -= lap['sums']
+        self.counts -= lap['counts']
+        self.samples -= lap['samples']
+        # no rounding errors left where nothing remains
+        self.sums[self.counts == 0] = 0
+
+    def update(self, laps):
+        '''
+        Makes this the average of laps: removes the laps that aren't in laps,
+        and gets the telemetry of the laps that aren't in the average yet.
+
+        :param fastf1.core.Laps laps: Laps to average, of self.session
+        :return LapAverage: self
+        '''
+        keys = list(zip(laps['Driver'], laps['LapNumber']))
+        with self.lock:
+            for key in [key for key in self.laps if key not in keys]:
+                self._remove(key)
+            new_laps = laps[[key not in self.laps for key in keys]]
+            if len(new_laps):
+                self.add(get_lap_data(Laps(new_laps, session=self.session), which='tel', batch=True))
+            # drivers are listed in the order of laps
+            self.laps = {key: self.laps[key] for key in dict.fromkeys(keys) if key in self.laps}
+        return self
+
+    def copy(self):
+        '''
+        :return LapAverage: Average of the same laps that can be updated without changing this one
+        '''
+        with self.lock:
+            average = LapAverage(session=self.session, num_sections=len(self.edges))
+            # the sums of each lap are never changed in place, so they can be shared
+            average.laps = dict(self.laps)
+            average.columns = self.columns
+            if self.columns is not None:
+                average.date_ref = self.date_ref
+                average.sums, average.counts, average.samples = self.sums.copy(), self.counts.copy(), self.samples.copy()
+        return average
+
+    def average_of(self, laps, rolling=True):
+        '''
+        Same as update(laps).get_telemetry(rolling), without another thread
+        changing the laps in between.
+
+        :param fastf1.core.Laps laps: Laps to average, of self.session
+        :param bool rolling: If should smooth the channels, see get_telemetry, defaults to True
+        :return fastf1.core.Telemetry: Average telemetry of laps
+        '''
+        with self.lock:
+            return self.update(laps).get_telemetry(rolling)
+
+    @property
+    def nbytes(self):
+        '''Memory held by the sums of the average and of each lap, in bytes.'''
+        with self.lock:
+            total = sum(lap['sums'].nbytes + lap['counts'].nbytes + lap['samples'].nbytes for lap in self.laps.values())
+            if self.columns is not None:
+                total += self.sums.nbytes + self.counts.nbytes + self.samples.nbytes
+            return total
+
+    def _values(self, col):
+        # dates and timedeltas are summed as nanoseconds, dates from the first one added
+        if col.dtype.kind == 'M':
+            col = col - self.date_ref
+        if col.dtype.kind == 'm':
+            values = col.to_numpy().astype('timedelta64[ns]')
+            return np.where(np.isnat(values), np.nan, values.view('int64').astype('float64'))
+        return col.to_numpy(dtype='float64', na_value=np.nan)
+
+    def get_telemetry(self, rolling=True):
+        '''
+        Gets the average lap, about one sample per section of the grid.
+
+        :param bool rolling: If should smooth all channels but the times with a rolling mean of 5 samples, defaults to True
+        :return fastf1.core.Telemetry: Average telemetry, with the session set
+        '''
+        with self.lock:
+            if self.columns is None:
+                return Telemetry(session=self.session)
+            present = self.samples > 0
+            counts = self.counts[:, present]
+            means = np.where(counts > 0, self.sums[:, present] / np.maximum(counts, 1), np.nan)
+            drivers = dict.fromkeys(driver for driver, _ in self.laps)
+            drivers_ahead = dict.fromkeys(d for lap in self.laps.values() for d in lap['drivers_ahead']
+                                          if isinstance(d, str))
+        avg_lap = pd.DataFrame({col: means[i] for i, (col, _dtype) in enumerate(self.columns)})
+        if rolling:
+            smoothed = [col for col in avg_lap.columns if col not in self.time_columns]
+            avg_lap[smoothed] = avg_lap[smoothed].rolling(window=5, min_periods=1, center=True).mean()
+        for col, dtype in self.columns:
+            if dtype.kind in 'mM':
+                ns = np.where(np.isnan(avg_lap[col]), np.iinfo('int64').min,
+                              np.rint(avg_lap[col])).astype('int64').view('timedelta64[ns]')
+                avg_lap[col] = ns if dtype.kind == 'm' else np.where(
+                    np.isnat(ns), np.datetime64('NaT'), np.datetime64(self.date_ref) + ns).astype('datetime64[ns]')
+        avg_lap['Source'] = 'average'
+        avg_lap['Driver'] = ''.join(drivers)
+        avg_lap['DriverAhead'] = ''.join(drivers_ahead)
+        return Telemetry(avg_lap, session=self.session)
+
+
+# number of lap sets whose average is kept on each session
+lap_averages_per_session = 8
+_lap_averages_lock = threading.Lock()
+
+
+def get_lap_average(session, laps, rolling=True):
+    '''
+    Gets the average telemetry of laps with a LapAverage kept on the session
+    for that set of laps. A new set starts from a copy of the kept average
+    sharing the most laps with it, so only the laps that differ have to be
+    added or removed. The last lap_averages_per_session sets are kept.
+
+    :param fastf1.core.Session session: Session of the laps
+    :param fastf1.core.Laps laps: Laps to average
+    :param bool rolling: If should smooth the channels, see LapAverage.get_telemetry, defaults to True
+    :return fastf1.core.Telemetry: Average telemetry of laps
+    '''
+    key = frozenset(zip(laps['Driver'], laps['LapNumber'].astype('float64')))
+    with _lap_averages_lock:
+        if getattr(session, 'lap_averages', None) is None:
+            session.lap_averages = OrderedDict()
+        averages = session.lap_averages
+        if key in averages:
+            averages.move_to_end(key)
+            average = averages[key]
+        else:
+            closest = max(averages, key=lambda k: len(k & key), default=None)
+            average = averages[closest].copy() if closest is not None and closest & key else \
+                LapAverage(session=session)
+            averages[key] = average
+            while len(averages) > lap_averages_per_session:
+                averages.popitem(last=False)
+    return average.average_of(laps, rolling)
+
+
 class LapComparison:
     def __init__(self, sess=None, label1=None, label2=None, lap1=None, lap2=None, color1=None, color2=None, color_sep=0.125):
         if label1 is None and lap1 is None:
@@ -757,18 +1342,18 @@ class LapComparison:
 
         if isinstance(lap1, pd.DataFrame):
             self.lap1 = average_lap(lap1)
-            self.lap1tel = average_lap_tel(get_lap_data(lap1, which='tel'))
+            self.lap1tel = average_lap_tel(get_lap_data(lap1, which='tel', batch=True))
         else:
-            self.lap1 = lap1 if lap1 is not None else sess.laps.pick_driver(
-                label1).pick_fastest()
-            self.lap1tel = self.lap1.get_telemetry().reset_index(drop=True)
+            self.lap1 = lap1 if lap1 is not None else get_fastest_lap(sess, label1)
+            self.lap1tel = get_lap_telemetry(
+                self.lap1).reset_index(drop=True)
         if isinstance(lap2, pd.DataFrame):
             self.lap2 = average_lap(lap2)
-            self.lap2tel = average_lap_tel(get_lap_data(lap2, which='tel'))
+            self.lap2tel = average_lap_tel(get_lap_data(lap2, which='tel', batch=True))
         else:
-            self.lap2 = lap2 if lap2 is not None else sess.laps.pick_driver(
-                label2).pick_fastest()
-            self.lap2tel = self.lap2.get_telemetry().reset_index(drop=True)
+            self.lap2 = lap2 if lap2 is not None else get_fastest_lap(sess, label2)
+            self.lap2tel = get_lap_telemetry(
+                self.lap2).reset_index(drop=True)
         self.label1 = label1 if label1 is not None else self.lap1['Driver']
         self.label2 = label2 if label2 is not None else self.lap2['Driver']
         self.color1 = color1 if color1 is not None else '#f00'
@@ -908,9 +1493,11 @@ class LapComparison:
                          label='Speed Diff', ax=ax3, color='yellow')
 
         if show_sectors:
-            for n in ['Sector1SessionTime', 'Sector2SessionTime', 'Sector3SessionTime']:
-                sdist = get_distance_from_time(
-                    self.lap1tel, self.lap1[n] - self.lap1.LapStartTime, relative=x_axis == 'RelativeDistance')
+            sector_names = ['Sector1SessionTime', 'Sector2SessionTime', 'Sector3SessionTime']
+            sector_dists = get_distances_at_times(
+                [self.lap1tel], [[self.lap1[n] - self.lap1.LapStartTime for n in sector_names]],
+                relative=x_axis == 'RelativeDistance')[0]
+            for n, sdist in zip(sector_names, sector_dists):
                 tdiff = f'{((self.lap2[n] - self.lap1[n]).total_seconds() - (self.lap2.LapStartTime - self.lap1.LapStartTime).total_seconds()):+.3f}'
                 add_vert_line(ax=axes[0], xval=sdist,
                               col='white', text=tdiff, yval=325, size=16)
@@ -956,6 +1543,33 @@ class LapComparison:
 
 
 # NEW STUFF
+def rolling_median_mad(vals, k, groups=None):
+    '''
+    Same as vals.rolling(window=k, center=True) median and median absolute
+    deviation (MAD), computed on all windows at once. Windows with missing
+    values, or that would cross from one group into another, are NaN.
+
+    :param array-like vals: Values
+    :param int k: Size of window
+    :param np.ndarray groups: Group code of each value, groups must be contiguous, defaults to None (one group)
+    :return Tuple(np.ndarray, np.ndarray): Rolling median and MAD, centered
+    '''
+    vals = np.asarray(vals, dtype='float64')
+    median, mad = np.full(len(vals), np.nan), np.full(len(vals), np.nan)
+    if k < 1 or len(vals) < k:
+        return median, mad
+    missing = np.concatenate([[0], np.cumsum(np.isnan(vals))])
+    valid = missing[k:] == missing[:-k]
+    if groups is not None:
+        valid &= groups[k - 1:] == groups[:len(vals) - k + 1]
+    windows = sliding_window_view(vals, k)[valid]
+    window_median = np.median(windows, axis=1)
+    centers = np.flatnonzero(valid) + k // 2
+    median[centers] = window_median
+    mad[centers] = np.median(np.abs(windows - window_median[:, None]), axis=1)
+    return median, mad
+
+
 def hampel(vals_orig, k=7, t0=3):
     '''
     https://stackoverflow.com/questions/46819260/filtering-outliers-how-to-make-median-based-hampel-function-faster
@@ -968,11 +1582,9 @@ def hampel(vals_orig, k=7, t0=3):
 
     # Hampel Filter
     L = 1.4826
-    rolling_median = vals.rolling(window=k, center=True).median()
-    def MAD(x): return np.median(np.abs(x - np.median(x)))
-    rolling_MAD = vals.rolling(window=k, center=True).apply(MAD)
+    rolling_median, rolling_MAD = rolling_median_mad(vals, k)
     threshold = t0 * L * rolling_MAD
-    difference = np.abs(vals - rolling_median)
+    difference = np.abs(vals.to_numpy(dtype='float64') - rolling_median)
 
     '''
     Perhaps a condition should be added here in the case that the threshold value
@@ -985,6 +1597,87 @@ def hampel(vals_orig, k=7, t0=3):
     return (vals)
 
 
+def hampel_outliers(vals, groups, k=7, t0=3):
+    '''
+    Finds the values that hampel would change, running it on the values of
+    every group at once. Missing values are marked too, like comparing the
+    values to the output of hampel does. Values without a group aren't marked.
+
+    :param pd.Series vals: Values, like lap times in seconds
+    :param pd.Series groups: Group of each value, like the driver, values of a group don't need to be together
+    :param int k: Size of window, defaults to 7
+    :param int t0: Number of scaled MADs from the median that a value is an outlier at, defaults to 3
+    :return np.ndarray: If each value is an outlier
+    '''
+    vals = np.asarray(vals, dtype='float64')
+    codes = pd.factorize(groups)[0]
+    # values of each group together, in their original order
+    order = np.argsort(codes, kind='stable')
+    sorted_vals = vals[order]
+    rolling_median, rolling_MAD = rolling_median_mad(sorted_vals, k, codes[order])
+    outliers = np.empty(len(vals), dtype=bool)
+    outliers[order] = (np.abs(sorted_vals - rolling_median) > t0 * 1.4826 * rolling_MAD) | np.isnan(sorted_vals)
+    return outliers & (codes >= 0)
+
+
+def fit_stint_models(laps, y_col, x_col='LapNumber', degree=1, by=('Driver', 'Stint')):
+    '''
+    Fits a polynomial of y_col against x_col to every group of laps (every
+    stint of every driver by default), like np.polyfit on each group, but
+    with one batched least squares solve of all the groups' normal equations.
+    x values are centered on each group's mean for the solve, and the
+    coefficients are given for x itself. Laps missing x, y or a group are
+    left out, and groups with too few laps for the fit get NaN.
+
+    :param pd.DataFrame laps: Laps
+    :param str y_col: Column that is fitted, must be numeric
+    :param str x_col: Column it is fitted against, defaults to 'LapNumber'
+    :param int degree: 1 for linear or 2 for quadratic fits, defaults to 1
+    :param Tuple(str) by: Columns that define the groups, defaults to ('Driver', 'Stint')
+    :return pd.DataFrame: Group columns, CountLaps, Intercept, Slope (and Quadratic if degree is 2), ResidualStd, MaxResidual and R2 of each group
+    '''
+    if degree not in (1, 2):
+        raise Exception("degree must be 1 (linear) or 2 (quadratic)")
+    by = list(by)
+    xs = laps[x_col].to_numpy(dtype='float64', na_value=np.nan)
+    ys = laps[y_col].to_numpy(dtype='float64', na_value=np.nan)
+    valid = ~(np.isnan(xs) | np.isnan(ys)) & laps[by].notna().all(axis=1).to_numpy()
+    grouped = laps[valid].groupby(by)
+    codes, xs, ys = grouped.ngroup().to_numpy(), xs[valid], ys[valid]
+    num_groups = grouped.ngroups
+    counts = np.bincount(codes, minlength=num_groups)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_x = np.bincount(codes, xs, num_groups) / counts
+        mean_y = np.bincount(codes, ys, num_groups) / counts
+    dx = xs - mean_x[codes]
+    powers = dx[:, None] ** np.arange(2 * degree + 1)
+    moments = np.stack([np.bincount(codes, p, num_groups) for p in powers.T], axis=1)
+    # normal equations of every group, A[g] @ coefs[g] = b[g]
+    A = moments[:, np.add.outer(np.arange(degree + 1), np.arange(degree + 1))]
+    b = np.stack([np.bincount(codes, p * ys, num_groups) for p in powers[:, :degree + 1].T], axis=1)
+    coefs = np.full((num_groups, degree + 1), np.nan)
+    fit = counts > degree
+    coefs[fit] = (np.linalg.pinv(A[fit]) @ b[fit][..., None])[..., 0]
+    residuals = ys - (powers[:, :degree + 1] * coefs[codes]).sum(axis=1)
+    ssr = np.bincount(codes, residuals ** 2, num_groups)
+    sst = np.bincount(codes, (ys - mean_y[codes]) ** 2, num_groups)
+    max_residual = np.full(num_groups, np.nan)
+    np.fmax.at(max_residual, codes, np.abs(residuals))
+    # back from centered x: c0 + c1 (x - m) + c2 (x - m)^2
+    c0, c1 = coefs[:, 0], coefs[:, 1]
+    c2 = coefs[:, 2] if degree == 2 else 0
+    result = grouped.size().rename('CountLaps').reset_index()
+    result['Intercept'] = c0 - c1 * mean_x + c2 * mean_x ** 2
+    result['Slope'] = c1 - 2 * c2 * mean_x
+    if degree == 2:
+        result['Quadratic'] = c2
+    with np.errstate(invalid='ignore', divide='ignore'):
+        result['ResidualStd'] = np.where(counts > degree + 1, np.sqrt(ssr / (counts - degree - 1)), np.nan)
+        result['MaxResidual'] = np.where(fit, max_residual, np.nan)
+        result['R2'] = np.where(fit & (sst > 0), 1 - ssr / sst, np.nan)
+    return result
+
+
 class RacePace:
     def __init__(self, session=None, laps=None, num_laps=None, fuel_load=100, driver_colors=None, tyre_markers=None):
         '''Initialize race pace with all laps from a session, or with only the laps provided.'''
@@ -1029,14 +1722,15 @@ class RacePace:
 
         :param str algorithm: 'std' or 'hampel', the algorithm that will be used to determine outliers
         '''
+        if algorithm == 'hampel':
+            self.laps['Outlier'] = hampel_outliers(
+                self.laps.LapTime.dt.total_seconds(), self.laps.Driver, k=self.num_laps//5)
+            return
         drop_inds = pd.Index([])
         for d, g in self.laps.groupby('Driver'):
             if algorithm == 'std':
                 outlier_inds = g.LapTime[abs(
                     g.LapTime - np.mean(g.LapTime)) > 3 * np.std(g.LapTime)].index
-            elif algorithm == 'hampel':
-                outlier_inds = g[g.LapTime.dt.total_seconds() != hampel(
-                    g.LapTime.dt.total_seconds(), k=self.num_laps//5)].index
             drop_inds = drop_inds.append(outlier_inds)
         self.laps['Outlier'] = False
         self.laps.loc[drop_inds, 'Outlier'] = True
@@ -1059,15 +1753,14 @@ class RacePace:
             pruned_laps = pruned_laps[pruned_laps.TrackStatus == '1']
         if prune_func is not None:
             pruned_laps = prune_func(pruned_laps)
-        if outlier_laps in ['hampel', 'std']:
+        if outlier_laps == 'hampel':
+            pruned_laps = pruned_laps[~hampel_outliers(
+                pruned_laps.LapTime.dt.total_seconds(), pruned_laps.Driver, k=self.num_laps//5)]
+        elif outlier_laps == 'std':
             drop_inds = pd.Index([])
             for d, g in pruned_laps.groupby('Driver'):
-                if outlier_laps == 'std':
-                    outlier_inds = g.LapTime[abs(
-                        g.LapTime - np.mean(g.LapTime)) > 3 * np.std(g.LapTime)].index
-                elif outlier_laps == 'hampel':
-                    outlier_inds = g[g.LapTime.dt.total_seconds() != hampel(
-                        g.LapTime.dt.total_seconds(), k=self.num_laps//5)].index
+                outlier_inds = g.LapTime[abs(
+                    g.LapTime - np.mean(g.LapTime)) > 3 * np.std(g.LapTime)].index
                 drop_inds = drop_inds.append(outlier_inds)
             pruned_laps = pruned_laps.drop(drop_inds)
         if inplace == 'keep':
@@ -1106,13 +1799,12 @@ class RacePace:
         fig, ax = plt.subplots()
 
         if add_best_fit_lines:
-            polys = {}
-            for i, g in self.laps.pick_wo_box().groupby(['Driver', 'Stint']):
-                x = g.LapNumber
-                y = g.GapToLeader
-                poly = np.poly1d(np.polyfit(x, y, 1))
-                polys[i] = poly
-                ax.plot(x, poly(x), color=self.driver_colors[i[0]])
+            wo_box = self.laps.pick_wo_box()
+            fits = fit_stint_models(wo_box, 'GapToLeader')
+            ends = wo_box.groupby(['Driver', 'Stint']).LapNumber.agg(['min', 'max']).reset_index()
+            for fit in fits.merge(ends, on=['Driver', 'Stint']).itertuples():
+                x = np.array([fit.min, fit.max])
+                ax.plot(x, fit.Intercept + fit.Slope * x, color=self.driver_colors[fit.Driver])
 
         sns.lineplot(data=self.laps, x='LapNumber', y='GapToLeader',
                      hue='Driver', palette=self.driver_colors, legend=False)
@@ -1172,28 +1864,30 @@ class RacePace:
         # 0.03 is the common one, we'll just stick with that
         if fuel_load is not None:
             self.fuel_load = fuel_load
-        all_new_laps = pd.DataFrame()
         if red_flags is None:
             red_flags = [0, float('inf')]
         else:
             red_flags = [0] + red_flags + [float('inf')]
-        for sln, eln in zip(red_flags, red_flags[1:]):
-            new_laps = self.laps[(self.laps.LapNumber > sln) & (
-                self.laps.LapNumber <= eln)].copy(deep=True)
-            times_fuel_adj = np.linspace(
-                self.fuel_load, 0, self.num_laps+1)[1:] * 0.3 / 10
-            for i, g in new_laps.groupby('Driver'):
-                new_lap_times = pd.to_timedelta((g.LapTime).dt.total_seconds(
-                ) - pd.Series(times_fuel_adj[:len(g)], index=g.index), unit='s')
-                new_laps.loc[g.index, 'LapTime'] = new_lap_times
-                start_time = g.LapStartTime.min()
-                new_times = start_time + new_lap_times.cumsum()
-                new_laps.loc[g.index, 'Time'] = new_times
-                new_start_times = new_times.shift(1)
-                new_start_times.iloc[0] = start_time
-                new_laps.loc[g.index, 'LapStartTime'] = new_start_times
-            all_new_laps = pd.concat([all_new_laps, new_laps])
-        all_new_laps.reset_index(drop=True, inplace=True)
+        # laps of each red flag segment, one segment after the other
+        segment = np.searchsorted(red_flags, self.laps.LapNumber.to_numpy(dtype='float64'), side='left') - 1
+        in_segment = np.flatnonzero((segment >= 0) & (segment < len(red_flags) - 1))
+        order = in_segment[np.argsort(segment[in_segment], kind='stable')]
+        all_new_laps = self.laps.iloc[order].reset_index(drop=True)
+        groups = all_new_laps.groupby([segment[order], all_new_laps.Driver.to_numpy()], sort=False)
+        has_group = all_new_laps.Driver.notna().to_numpy()
+        # every driver starts each segment with the full fuel load, lowered each lap they do in it
+        times_fuel_adj = np.r_[np.linspace(
+            self.fuel_load, 0, self.num_laps+1)[1:] * 0.3 / 10, 0]
+        lap_in_segment = np.minimum(groups.cumcount().to_numpy(), self.num_laps)
+        new_lap_times = pd.to_timedelta(all_new_laps.LapTime.dt.total_seconds(
+        ) - times_fuel_adj[lap_in_segment], unit='s')
+        start_time = groups.LapStartTime.transform('min')
+        new_times = start_time + new_lap_times.groupby(groups.ngroup().to_numpy()).cumsum()
+        new_start_times = new_times.groupby(groups.ngroup().to_numpy()).shift(1)
+        first_laps = groups.cumcount().to_numpy() == 0
+        new_start_times[first_laps] = start_time[first_laps]
+        for col, new_col in (('LapTime', new_lap_times), ('Time', new_times), ('LapStartTime', new_start_times)):
+            all_new_laps.loc[has_group, col] = new_col[has_group]
         if inplace:
             self.laps = all_new_laps
         else:
@@ -1222,12 +1916,35 @@ class RacePace:
             AverageLapTime=('LapTime', 'mean'),
             CountLaps=('LapNumber', 'count')
         ).reset_index()
+        return self._finish_stint_summary(race_pace)
+
+    @staticmethod
+    def _finish_stint_summary(race_pace):
         race_pace['AveragePctOff'] = (
             (race_pace.AverageLapTime / race_pace.AverageLapTime.min()) - 1) * 100
         race_pace['StintName'] = race_pace.Driver + ' S' + \
             race_pace.Stint.astype(str) + ' ' + race_pace.Compound
         return race_pace
 
+    def get_degradation(self, degree=1, x_col='TyreLife'):
+        '''
+        Fits a linear or quadratic lap time model to every stint of every
+        driver at once with fit_stint_models. Prune (and fuel correct) laps
+        first so only representative laps are fitted.
+
+        :param int degree: 1 for linear or 2 for quadratic models, defaults to 1
+        :param str x_col: Column lap times are fitted against, defaults to 'TyreLife'
+        :return pd.DataFrame: Each stint's Driver, Stint, Compound, FirstLapNum, LastLapNum, and its fit from fit_stint_models, in seconds
+        '''
+        fits = fit_stint_models(self.laps.assign(LapTimeSeconds=self.laps.LapTime.dt.total_seconds()),
+                                'LapTimeSeconds', x_col=x_col, degree=degree)
+        stints = self.laps.groupby(['Driver', 'Stint']).agg(
+            Compound=('Compound', 'first'),
+            FirstLapNum=('LapNumber', 'first'),
+            LastLapNum=('LapNumber', 'last')
+        ).reset_index()
+        return stints.merge(fits, on=['Driver', 'Stint'])
+
     def plot_stint_summary(self, stint_summary_override=None):
         race_pace = self.get_stint_summary().sort_values(
             'AveragePctOff') if stint_summary_override is None else stint_summary_override
@@ -1241,43 +1958,261 @@ class RacePace:
                     f"{row['CountLaps']} / {row['LastLapNum'] - row['FirstLapNum'] + 1}")
         return fig, ax
 
+    def _shift_later_laps(self, lap_diffs):
+        '''
+        Changes LapTime and Time of laps by lap_diffs, and moves Time and
+        LapStartTime of every later lap of the driver (higher LapNumber) by
+        the total change before it, in one pass over the laps.
+
+        :param np.ndarray lap_diffs: Change of each lap's time in nanoseconds, in the order of self.laps
+        '''
+        lap_numbers = self.laps.LapNumber.to_numpy(dtype='float64')
+        order = np.lexsort((lap_numbers, pd.factorize(self.laps.Driver)[0]))
+        ordered_numbers, ordered_drivers = lap_numbers[order], pd.factorize(self.laps.Driver)[0][order]
+        before = np.cumsum(lap_diffs[order]) - lap_diffs[order]
+        positions = np.arange(len(order))
+        driver_start = np.r_[True, ordered_drivers[1:] != ordered_drivers[:-1]][:len(order)]
+        number_start = driver_start | np.r_[True, ordered_numbers[1:] != ordered_numbers[:-1]][:len(order)]
+        # changes of the driver's laps with a lower lap number
+        earlier = before[np.maximum.accumulate(np.where(number_start, positions, 0))] - \
+            before[np.maximum.accumulate(np.where(driver_start, positions, 0))]
+        shifts = np.zeros(len(order), dtype='int64')
+        shifts[order] = np.where(np.isnan(ordered_numbers), 0, earlier)
+        self._apply_lap_diffs(lap_diffs, shifts)
+
+    def _apply_lap_diffs(self, lap_diffs, shifts):
+        '''
+        :param np.ndarray lap_diffs: Change of each lap's time in nanoseconds, added to LapTime and Time
+        :param np.ndarray shifts: Nanoseconds each lap is moved by, added to Time and LapStartTime
+        '''
+        lap_diffs = pd.to_timedelta(lap_diffs, unit='ns')
+        shifts = pd.to_timedelta(shifts, unit='ns')
+        self.laps['LapTime'] = self.laps.LapTime + lap_diffs
+        self.laps['Time'] = self.laps.Time + lap_diffs + shifts
+        self.laps['LapStartTime'] = self.laps.LapStartTime + shifts
+
+    def edit_laps(self, edits):
+        '''
+        Applies many lap time edits in one pass. Each edit either sets a
+        lap's time like replace_pace or changes it like adjust_pace, in the
+        order given, and every later lap of the driver moves by the total
+        change. Edits of laps that don't exist are ignored. Directly modifies object.
+
+        :param pd.DataFrame edits: Driver, LapNumber and either LapTime (new lap time) or Delta (change) of each edit, can be a list of dicts
+        '''
+        edits = pd.DataFrame(edits).reset_index(drop=True)
+        if len(edits) == 0:
+            return
+        for col in ('LapTime', 'Delta'):
+            edits[col] = pd.to_timedelta(edits[col]) if col in edits.columns else pd.NaT
+        # first lap of each driver and lap number, like replace_pace picks
+        keys = pd.MultiIndex.from_arrays([self.laps.Driver, self.laps.LapNumber.astype('float64')])
+        first = ~keys.duplicated()
+        lap_pos = pd.Series(np.flatnonzero(first), index=keys[first]).reindex(
+            pd.MultiIndex.from_arrays([edits.Driver, edits.LapNumber.astype('float64')])).to_numpy()
+        edits = edits[~np.isnan(lap_pos)].assign(Position=lap_pos[~np.isnan(lap_pos)].astype(int))
+        # a lap ends at its last set time, plus the changes after it
+        is_set = edits.LapTime.notna()
+        last_set = pd.Series(np.where(is_set, edits.index, -1), index=edits.index).groupby(
+            edits.Position).transform('max')
+        after_set = edits.index.to_numpy() > last_set.to_numpy()
+        deltas = edits.Delta.where(after_set & ~is_set, pd.Timedelta(0)).fillna(pd.Timedelta(0)) \
+            .groupby(edits.Position).sum()
+        set_times = edits[is_set & (edits.index == last_set)].set_index('Position').LapTime
+        old_times = self.laps.LapTime.iloc[deltas.index]
+        new_times = set_times.reindex(deltas.index).fillna(pd.Series(old_times.to_numpy(), index=deltas.index)) + deltas
+        lap_diffs = np.zeros(len(self.laps), dtype='int64')
+        diffs = (new_times.to_numpy() - old_times.to_numpy()).astype('timedelta64[ns]')
+        lap_diffs[deltas.index.to_numpy()] = np.where(np.isnat(diffs), 0, diffs.view('int64'))
+        self._shift_later_laps(lap_diffs)
+        # laps without a time get the one they were set to
+        self.laps.iloc[deltas.index[np.isnat(diffs)], self.laps.columns.get_loc('LapTime')] = \
+            new_times[np.isnat(diffs)].to_numpy()
+
     def replace_pace(self, driver, lap_num, lap_time):
         '''Directly modifies object'''
-        driver_laps = self.laps[self.laps.Driver == driver]
-        wanted_lap = driver_laps[driver_laps.LapNumber == lap_num].iloc[0]
-        lap_time_diff = lap_time - wanted_lap.LapTime
-        self.laps.loc[wanted_lap.name, 'LapTime'] = lap_time
-        self.laps.loc[wanted_lap.name, 'Time'] += lap_time_diff
-        greater_inds = driver_laps[driver_laps.LapNumber > lap_num].index
-        self.laps.loc[greater_inds, 'Time'] += lap_time_diff
-        self.laps.loc[greater_inds, 'LapStartTime'] += lap_time_diff
+        if not ((self.laps.Driver == driver) & (self.laps.LapNumber == lap_num)).any():
+            raise IndexError(f"{driver} has no lap {lap_num}")
+        self.edit_laps([{'Driver': driver, 'LapNumber': lap_num, 'LapTime': lap_time}])
 
     def adjust_pace(self, driver, lap_num, lap_time_diff):
         '''Directly modifies object'''
-        driver_laps = self.laps[self.laps.Driver == driver]
-        wanted_laps = driver_laps[driver_laps.LapNumber == lap_num]
-        if len(wanted_laps) == 0:
-            return None
-        wanted_lap = wanted_laps.iloc[0]
-        self.laps.loc[wanted_lap.name, 'LapTime'] += lap_time_diff
-        self.laps.loc[wanted_lap.name, 'Time'] += lap_time_diff
-        greater_inds = driver_laps[driver_laps.LapNumber > lap_num].index
-        self.laps.loc[greater_inds, 'Time'] += lap_time_diff
-        self.laps.loc[greater_inds, 'LapStartTime'] += lap_time_diff
+        self.edit_laps([{'Driver': driver, 'LapNumber': lap_num, 'Delta': lap_time_diff}])
 
     def reduce_lap_times(self, lap_nums, reduce_by=1.05):
         '''Directly modifies object'''
+        # each lap is reduced relative to the lap before it, which may have been reduced already
+        mean_times = self.laps.groupby('LapNumber').LapTime.mean()
+        lap_diffs = {}
         for lap_num in lap_nums:
-            reduce_to = self.laps[self.laps.LapNumber ==
-                                  (lap_num-1)].LapTime.mean() * reduce_by
-            lap_time_diff = reduce_to - \
-                self.laps[self.laps.LapNumber == lap_num].LapTime.mean()
-            wanted_laps = self.laps[self.laps.LapNumber == lap_num]
-            self.laps.loc[wanted_laps.index, 'LapTime'] += lap_time_diff
-            self.laps.loc[wanted_laps.index, 'Time'] += lap_time_diff
-            greater_inds = self.laps[self.laps.LapNumber > lap_num].index
-            self.laps.loc[greater_inds, 'Time'] += lap_time_diff
-            self.laps.loc[greater_inds, 'LapStartTime'] += lap_time_diff
+            reduce_to = mean_times.get(lap_num - 1, pd.NaT) * reduce_by
+            lap_time_diff = reduce_to - mean_times.get(lap_num, pd.NaT)
+            if pd.isna(lap_time_diff):
+                continue
+            lap_diffs[lap_num] = lap_diffs.get(lap_num, pd.Timedelta(0)) + lap_time_diff
+            mean_times[lap_num] += lap_time_diff
+        if not lap_diffs:
+            return
+        # every lap of every driver after a reduced lap moves by its change
+        reduced = pd.Series(lap_diffs).sort_index()
+        lap_numbers = self.laps.LapNumber.to_numpy(dtype='float64')
+        total_before = np.r_[0, np.cumsum(reduced.to_numpy().astype('timedelta64[ns]').view('int64'))]
+        shifts = total_before[np.searchsorted(reduced.index.to_numpy(dtype='float64'), lap_numbers, side='left')]
+        shifts[np.isnan(lap_numbers)] = 0
+        own = self.laps.LapNumber.map(reduced).fillna(pd.Timedelta(0))
+        self._apply_lap_diffs(own.to_numpy().astype('timedelta64[ns]').view('int64'), shifts)
+
+
+class RaceReplay(RacePace):
+    '''
+    RacePace that is filled lap by lap, like a race being replayed. Each call
+    to append_laps only updates what the new laps change: the gap to the
+    leader, the summary of their stints and the Hampel outlier flags whose
+    windows they complete.
+
+    The gap to leader is the time since the first car completed the same
+    lap, unlike add_gap_to_leader, whose reference needs the end of the race.
+    '''
+
+    def __init__(self, num_laps, fuel_load=100, driver_colors=None, tyre_markers=None):
+        '''
+        :param int num_laps: Number of laps of the race, sets the Hampel window like mark_outliers
+        :param int fuel_load: Fuel load for fuel correction, defaults to 100
+        :param dict driver_colors: Color of each driver, defaults to None
+        :param dict tyre_markers: Marker of each compound, defaults to the RacePace markers
+        '''
+        self.num_laps = num_laps
+        self.fuel_load = fuel_load
+        self.driver_colors = driver_colors if driver_colors is not None else {}
+        self.tyre_markers = tyre_markers if tyre_markers is not None else {
+            'SOFT': 'o', 'MEDIUM': 'D', 'HARD': 'v', 'INTERMEDIATE': 'P', 'WET': 's', 'UNKNOWN': 'X'}
+        self.window = num_laps // 5
+        self._reset()
+
+    def _reset(self):
+        self._chunks = []
+        self._laps = None
+        # Time each lap number was first completed at
+        self.leader_times = {}
+        # lap times in seconds, outlier flags and lap numbers of each driver, in the order laps were added
+        self.driver_times = {}
+        self.driver_outliers = {}
+        self.driver_lap_numbers = {}
+        self.stints = {}
+
+    @property
+    def laps(self):
+        if self._chunks:
+            outliers = {d: iter(flags) for d, flags in self.driver_outliers.items()}
+            self._laps = pd.concat(([self._laps] if self._laps is not None else []) + self._chunks,
+                                   ignore_index=True)
+            self._chunks = []
+            self._laps['Outlier'] = [next(outliers[d]) if d in outliers else False
+                                     for d in self._laps.Driver]
+        return self._laps if self._laps is not None else pd.DataFrame()
+
+    @laps.setter
+    def laps(self, laps):
+        # the replay starts again from the new laps
+        self._reset()
+        self.append_laps(laps.drop(columns=['GapToLeader', 'Outlier'], errors='ignore'))
+
+    def append_laps(self, new_laps):
+        '''
+        Adds laps to the replay, expected in about the order they were completed.
+
+        :param pd.DataFrame new_laps: Laps to add, with Driver, LapNumber, Stint, Compound, LapTime, LapStartTime and Time
+        :return Tuple(pd.DataFrame, List[Tuple(str, float)]): New laps with GapToLeader, and (driver, lap number) of the laps found to be outliers
+        '''
+        new_laps = pd.DataFrame(new_laps).reset_index(drop=True)
+        new_laps['LapTime'] = new_laps.LapTime.fillna(new_laps.Time - new_laps.LapStartTime)
+        for lap_num, time in zip(new_laps.LapNumber, new_laps.Time):
+            if pd.notna(time) and not (self.leader_times.get(lap_num, time) < time):
+                self.leader_times[lap_num] = time
+        new_laps['GapToLeader'] = (new_laps.Time - new_laps.LapNumber.map(self.leader_times)).dt.total_seconds()
+        outliers, windows = [], []
+        for row in new_laps[['Driver', 'LapNumber', 'Stint', 'Compound', 'LapTime']].itertuples(index=False):
+            outliers += self._add_lap_time(row.Driver, row.LapNumber, row.LapTime, windows)
+            self._add_stint_lap(row)
+        if windows:
+            # every window completed by the new laps is checked at once, like hampel_outliers does
+            times = np.array([self.driver_times[driver][start:start + self.window] for driver, start in windows])
+            center = self.window // 2
+            median = np.median(times, axis=1)
+            mad = np.median(np.abs(times - median[:, None]), axis=1)
+            for (driver, start), is_outlier in zip(windows, np.abs(times[:, center] - median) > 3 * 1.4826 * mad):
+                if is_outlier and not self.driver_outliers[driver][start + center]:
+                    self.driver_outliers[driver][start + center] = True
+                    outliers.append((driver, self.driver_lap_numbers[driver][start + center]))
+        self._chunks.append(new_laps)
+        return new_laps, outliers
+
+    def _add_lap_time(self, driver, lap_num, lap_time, windows):
+        '''
+        Adds a lap to its driver's times, flags it if it has no time, and adds
+        the (driver, start) of the Hampel window it completes to windows.
+        '''
+        if pd.isna(driver):
+            return []
+        times = self.driver_times.setdefault(driver, [])
+        flags = self.driver_outliers.setdefault(driver, [])
+        self.driver_lap_numbers.setdefault(driver, []).append(lap_num)
+        times.append(lap_time.total_seconds() if pd.notna(lap_time) else np.nan)
+        flags.append(bool(np.isnan(times[-1])))
+        start = len(times) - self.window
+        if self.window >= 1 and start >= 0 and not np.isnan(times[start:]).any():
+            windows.append((driver, start))
+        return [(driver, lap_num)] if flags[-1] else []
+
+    def _add_stint_lap(self, lap):
+        if pd.isna(lap.Driver) or pd.isna(lap.Stint):
+            return
+        stint = self.stints.setdefault((lap.Driver, lap.Stint), {
+            'Compound': None, 'FirstLapNum': np.nan, 'LastLapNum': np.nan, 'TotalTime': pd.Timedelta(0),
+            'CountTimes': 0, 'CountLaps': 0})
+        if stint['Compound'] is None and pd.notna(lap.Compound):
+            stint['Compound'] = lap.Compound
+        if pd.notna(lap.LapNumber):
+            if np.isnan(stint['FirstLapNum']):
+                stint['FirstLapNum'] = lap.LapNumber
+            stint['LastLapNum'] = lap.LapNumber
+            stint['CountLaps'] += 1
+        if pd.notna(lap.LapTime):
+            stint['TotalTime'] += lap.LapTime
+            stint['CountTimes'] += 1
+
+    def get_stint_summary(self):
+        race_pace = pd.DataFrame([{
+            'Driver': driver, 'Stint': stint, 'Compound': info['Compound'],
+            'FirstLapNum': info['FirstLapNum'], 'LastLapNum': info['LastLapNum'],
+            'AverageLapTime': info['TotalTime'] / info['CountTimes'] if info['CountTimes'] else pd.NaT,
+            'CountLaps': info['CountLaps']} for (driver, stint), info in sorted(self.stints.items())],
+            columns=['Driver', 'Stint', 'Compound', 'FirstLapNum', 'LastLapNum', 'AverageLapTime', 'CountLaps'])
+        race_pace['AverageLapTime'] = pd.to_timedelta(race_pace.AverageLapTime)
+        return self._finish_stint_summary(race_pace)
+
+
+def get_session_degradation(session, degree=1, fuel_corrected=False):
+    '''
+    Gets the tyre degradation model of every stint of a session with
+    RacePace.get_degradation, on green flag laps without pit laps or Hampel
+    outliers. Results are kept on the session, so each model is fitted once.
+
+    :param fastf1.core.Session session: Loaded session
+    :param int degree: 1 for linear or 2 for quadratic models, defaults to 1
+    :param bool fuel_corrected: Whether to fit fuel corrected lap times, defaults to False
+    :return pd.DataFrame: Result of RacePace.get_degradation
+    '''
+    if getattr(session, 'degradation', None) is None:
+        session.degradation = {}
+    if (degree, fuel_corrected) not in session.degradation:
+        race_pace = RacePace(session)
+        # fuel correction counts every lap, so it's done before pruning
+        if fuel_corrected:
+            race_pace.calculate_fuel_corrected(inplace=True)
+        race_pace.prune_laps(outlier_laps='hampel', inplace=True)
+        session.degradation[(degree, fuel_corrected)] = race_pace.get_degradation(degree)
+    return session.degradation[(degree, fuel_corrected)]
 
 
 def replace_data(orig_df, orig_start=None, orig_end=None, replace_df=None, replace_start=None, replace_end=None):
@@ -1347,24 +2282,117 @@ def resample_2_by_dist(lap1data, lap2data, add_zero=True, x_axis='Distance'):
             lap2data.resample_channels(new_date_ref=new_dates['Time_y']))
 
 
-def resample_all_by_dist(lap_datas, x_axis='Distance'):
-    # For this function, we'll just sample every other lap off of the first lap that was passed
-    ref_dists = lap_datas[0][[x_axis]].drop_duplicates().copy(deep=True)
-    ref_dists['Time'] = pd.NA
-    dists_index = pd.Index(ref_dists[x_axis])
+def resample_at_dates(tel, new_dates, as_dict=False):
+    '''
+    Same as tel.resample_channels(new_date_ref=new_dates), without merging
+    the new dates into the telemetry. Channels are interpolated the way
+    fastf1 fills them after a merge: linearly for 'index' channels, with
+    scipy's interp1d for spline channels, and forward filled for discrete
+    channels. Unknown channels are only kept where a new date matches a
+    sample.
+
+    :param fastf1.core.Telemetry tel: Telemetry sorted by Date
+    :param pd.Series new_dates: Dates to get the telemetry at, without duplicates
+    :param bool as_dict: If should return the columns as a dict of arrays instead, defaults to False
+    :return fastf1.core.Telemetry: Telemetry at new_dates, sorted by Date
+    '''
+    # columns of a plain dataframe are much cheaper to get than those of a Telemetry
+    frame = pd.DataFrame(tel, copy=False)
+    dates = frame['Date'].to_numpy()
+    new_dates = np.sort(np.asarray(new_dates, dtype=dates.dtype))
+    # fastf1 (through pandas) interpolates on the dates as float nanoseconds (or whatever unit Date has)
+    x, new_x = dates.view('int64').astype('float64'), new_dates.view('int64').astype('float64')
+    # position of the sample at or before each new date, and whether the new date is that sample
+    before = np.maximum(np.searchsorted(dates, new_dates, side='right') - 1, 0)
+    matches = (dates[before] == new_dates) if len(dates) else np.zeros(len(new_dates), dtype=bool)
+    columns = {'Date': new_dates}
+    # spline channels without missing values share one fit per method
+    complete_splines = {}
+    for col in frame.columns:
+        channel = tel._CHANNELS.get(col, {'type': 'unknown'})
+        if channel['type'] == 'continuous' and channel['method'] not in ('index', 'linear', 'time', 'values') \
+                and frame[col].dtype.kind in 'fiu' and len(frame) and frame[col].notna().all():
+            complete_splines.setdefault(channel['method'], []).append(col)
+    for method, cols in complete_splines.items():
+        fitted = interp1d(x, frame[cols].to_numpy(dtype='float64'), kind=method, axis=0,
+                          fill_value='extrapolate')(new_x)
+        # pandas only extrapolates forwards, dates before the first sample stay empty
+        fitted[new_x < x[0]] = np.nan
+        columns.update(zip(cols, fitted.T))
+    for col in frame.columns:
+        if col in ('Date', 'Time', 'SessionTime'):
+            continue
+        values = frame[col].to_numpy()
+        channel = tel._CHANNELS.get(col, {'type': 'unknown'})
+        valid = ~pd.isna(values)
+        if channel['type'] == 'continuous' and values.dtype != object and valid.any():
+            if col in columns:
+                new_values = columns[col]
+            elif channel['method'] in ('index', 'linear', 'time', 'values'):
+                new_values = np.interp(new_x, x[valid], values[valid])
+            else:
+                new_values = interp1d(x[valid], values[valid], kind=channel['method'],
+                                      fill_value='extrapolate')(new_x)
+                # pandas only extrapolates forwards, dates before the first valid sample stay empty
+                new_values[new_x < x[valid][0]] = np.nan
+            new_values = np.where(matches & valid[before], values[before], new_values)
+        elif channel['type'] == 'discrete' and valid.any():
+            # last valid sample at or before each date, or the first valid sample for dates before it
+            valid_pos = np.flatnonzero(valid)
+            last_valid = np.searchsorted(valid_pos, np.where(matches | (new_dates > dates[before]), before, -1),
+                                         side='right') - 1
+            new_values = values[valid_pos[np.maximum(last_valid, 0)]]
+        else:
+            new_values = np.where(matches, values[before], np.nan)
+            if col == 'Source':
+                new_values = np.where(pd.isna(new_values), 'interpolation', new_values)
+        if new_values.dtype != values.dtype:
+            # restore the dtype like fastf1 does after merging, unless missing values prevent it
+            try:
+                new_values = pd.Series(new_values).astype(values.dtype).to_numpy()
+            except ValueError:
+                pass
+        columns[col] = new_values
+    # same time columns as fastf1 computes for the merged telemetry, which starts at the first date of either
+    columns['SessionTime'] = new_dates - np.datetime64(tel.session.t0_date)
+    if len(new_dates):
+        columns['Time'] = new_dates - min(dates[0], new_dates[0]) if len(dates) else new_dates - new_dates[0]
+    else:
+        columns['Time'] = columns['SessionTime']
+    order = ['Date'] + [c for c in tel.columns if c != 'Date'] + \
+        [c for c in ('SessionTime', 'Time') if c not in tel.columns]
+    columns = {c: columns[c] for c in order}
+    return columns if as_dict else Telemetry(columns, session=tel.session, driver=tel.driver)
 
-    new_dates = []
-    for i in range(1, len(lap_datas)):
-        dist_times = pd.concat([lap_datas[i][[x_axis, 'Time']], ref_dists]).set_index(
-            x_axis).sort_index()
-        new_times = interpolate_times(
-            dist_times.Time).bfill().loc[ref_dists[x_axis]].drop_duplicates()
-        dists_index = dists_index.intersection(new_times.index)
-        new_dates.append(lap_datas[i]['Date'].iloc[0] + new_times)
 
-    return ([lap_datas[0].set_index(x_axis).loc[dists_index].reset_index()] +
-            [lap_datas[i].resample_channels(new_date_ref=new_dates[i-1].loc[dists_index]).reset_index(drop=True)
-             for i in range(1, len(lap_datas))])
+def resample_all_by_dist(lap_datas, x_axis='Distance'):
+    '''
+    Resamples laps onto the x_axis values of the first lap. The time at which
+    every other lap reaches each of those values is interpolated, then each
+    lap is resampled at those times with resample_at_dates. Positions where a
+    lap's time doesn't change (before its first or after its last sample)
+    are dropped from all laps.
+
+    :param List[fastf1.core.Telemetry] lap_datas: Telemetry of each lap, the first lap is the reference
+    :param str x_axis: 'Distance' or 'RelativeDistance', defaults to 'Distance'
+    :return List[fastf1.core.Telemetry]: Telemetry of each lap with the same number of samples
+    '''
+    ref_x = lap_datas[0][x_axis].drop_duplicates().to_numpy(dtype='float64')
+    keep = np.ones(len(ref_x), dtype=bool)
+    new_dates = []
+    for lap_data in lap_datas[1:]:
+        lap_x = lap_data[x_axis].to_numpy(dtype='float64')
+        order = np.argsort(lap_x, kind='stable')
+        times = pd.to_timedelta(np.interp(ref_x, lap_x[order], lap_data['Time'].dt.total_seconds().to_numpy()[order]),
+                                unit='s')
+        # where several positions get the same time, only the first is kept
+        keep &= ~pd.Index(times).duplicated()
+        new_dates.append(lap_data['Date'].iloc[0] + times)
+    lap0 = lap_datas[0]
+    lap0 = lap0[np.isin(lap0[x_axis].to_numpy(dtype='float64'), ref_x[keep])]
+    return ([lap0[[x_axis] + [c for c in lap0.columns if c != x_axis]].reset_index(drop=True)] +
+            [resample_at_dates(lap_data, dates[keep]).reset_index(drop=True)
+             for lap_data, dates in zip(lap_datas[1:], new_dates)])
 
 
 def resample_2_by_sector(lap1, lap2, lap1data=None, lap2data=None, x_axis='Distance', return_dists=False):
@@ -1405,32 +2433,66 @@ def resample_2_by_sector(lap1, lap2, lap1data=None, lap2data=None, x_axis='Dista
     return lap_comparison
 
 
+def slice_sectors(lap, lap_data, sector_names=('LapStartTime', 'Sector1SessionTime', 'Sector2SessionTime', 'Sector3SessionTime')):
+    '''
+    Splits a lap's telemetry into sectors. Gives the same sectors as calling
+    slice_by_time(start, end, interpolate_edges=True).add_distance().add_relative_distance()
+    for each pair of consecutive times in sector_names, but finds all the
+    boundaries at once and interpolates the telemetry once for the whole lap.
+
+    :param fastf1.core.Lap lap: Lap with the sector times
+    :param fastf1.core.Telemetry lap_data: Telemetry of the lap, sorted by Date
+    :param Tuple(str) sector_names: Columns of lap with the SessionTime of each boundary, defaults to the lap start and the three sector ends
+    :return List[fastf1.core.Telemetry]: Telemetry of each sector, with Time, Distance and RelativeDistance counted from its start
+    '''
+    bounds = pd.to_timedelta([lap[n] for n in sector_names]).to_numpy()
+    dates = lap_data['Date'].to_numpy()
+    bound_dates = (np.datetime64(lap_data.session.t0_date) + bounds).astype(dates.dtype)
+    first, last = np.searchsorted(dates, bound_dates[0], side='left'), np.searchsorted(
+        dates, bound_dates[-1], side='right')
+    # samples of the lap and interpolated samples at every boundary, like merge_channels would add
+    window = np.union1d(dates[first:last], bound_dates)
+    filled = resample_at_dates(lap_data, window, as_dict=True)
+    columns = ['Date', 'SessionTime'] + [c for c in filled
+                                         if c not in ('Date', 'SessionTime', 'Distance', 'RelativeDistance')]
+    bound_pos = np.searchsorted(window, bound_dates)
+    sectors = []
+    for start, end, start_time in zip(bound_pos, bound_pos[1:], bounds):
+        sector = {c: filled[c][start:end + 1] for c in columns}
+        sector['Time'] = sector['SessionTime'] - start_time
+        # same integration as Telemetry.add_distance
+        seconds = pd.Series(sector['Time']).dt.total_seconds().to_numpy()
+        dist = np.cumsum(sector['Speed'] / 3.6 * np.diff(seconds, prepend=0))
+        sector['Distance'] = dist
+        sector['RelativeDistance'] = dist / dist[-1]
+        sectors.append(Telemetry(sector, session=lap_data.session, driver=lap_data.driver))
+    return sectors
+
+
 def resample_all_by_sector(laps, lapsdata=None, x_axis='Distance', return_dists=False):
     if lapsdata is None:
-        lapsdata = [lap.get_telemetry() for lap in laps]
-    lap_comparison = [pd.DataFrame() for _ in laps]
-    sector_names = ['LapStartTime', 'Sector1SessionTime',
-                    'Sector2SessionTime', 'Sector3SessionTime']
+        lapsdata = [get_lap_telemetry(lap) for lap in laps]
+    lap_sectors = [slice_sectors(laps[i], lapsdata[i]) for i in range(len(laps))]
+    lap_comparison = [[] for _ in laps]
+    # distance and time at the end of the sectors done so far, for each lap
+    dist_offsets, time_offsets = np.zeros(len(laps)), [pd.Timedelta(0)] * len(laps)
     sector_dists = []
-    for sn1, sn2 in zip(sector_names, sector_names[1:]):
-        sects = [lapsdata[i].slice_by_time(laps[i][sn1], laps[i][sn2], interpolate_edges=True).add_distance(
-        ).add_relative_distance() for i in range(len(laps))]
-        sect_comparison = resample_all_by_dist(sects, x_axis=x_axis)
-        last_dist = 0
+    for sects in zip(*lap_sectors):
+        sect_comparison = resample_all_by_dist(list(sects), x_axis=x_axis)
+        sector_dists.append(dist_offsets.sum()/len(laps))
         for i in range(len(laps)):
-            if len(lap_comparison[i]) > 0:
-                last_dist += lap_comparison[i].Distance.iloc[-1]
-                sect_comparison[i]['Distance'] += lap_comparison[i].Distance.iloc[-1]
-                sect_comparison[i]['Time'] += lap_comparison[i].Time.iloc[-1]
-            lap_comparison[i] = pd.concat(
-                [lap_comparison[i], sect_comparison[i]], ignore_index=True)
-        sector_dists.append(last_dist/len(laps))
-    last_dist = 0
+            if lap_comparison[i]:
+                sect_comparison[i]['Distance'] += dist_offsets[i]
+                sect_comparison[i]['Time'] += time_offsets[i]
+            dist_offsets[i] = sect_comparison[i].Distance.iloc[-1]
+            time_offsets[i] = sect_comparison[i].Time.iloc[-1]
+            lap_comparison[i].append(sect_comparison[i])
+    lap_comparison = [pd.concat(sect_comparisons, ignore_index=True)
+                      for sect_comparisons in lap_comparison]
     for i in range(len(laps)):
         lap_comparison[i]['RelativeDistance'] = lap_comparison[i]['Distance'] / \
             lap_comparison[i]['Distance'].iloc[-1]
-        last_dist += lap_comparison[i]['Distance'].iloc[-1]
-    sector_dists.append(last_dist/len(laps))
+    sector_dists.append(dist_offsets.sum()/len(laps))
     if return_dists:
         if x_axis == 'RelativeDistance':
             sector_dists = [d/sector_dists[-1] for d in sector_dists]
@@ -1438,7 +2500,97 @@ def resample_all_by_sector(laps, lapsdata=None, x_axis='Distance', return_dists=
     return lap_comparison
 
 
+def index_laps(session):
+    '''
+    Indexes the laps of a session so get_lap and get_fastest_lap don't have to
+    scan them. Sets session.lap_positions, mapping (Driver, LapNumber) to the
+    positions of the lap in session.laps, and session.fastest_lap_positions,
+    mapping each driver to the position of the lap pick_fastest would return.
+
+    :param fastf1.core.Session session: Loaded session
+    '''
+    laps = session.laps
+    lap_positions = laps.groupby(['Driver', 'LapNumber'], sort=False).indices
+    personal_bests = laps[(laps['IsPersonalBest'] == True) & laps['LapTime'].notna()]  # noqa: E712
+    # idxmin keeps the first of equal times, like pick_fastest
+    fastest = personal_bests.groupby('Driver', sort=False)['LapTime'].idxmin()
+    session.fastest_lap_positions = dict(zip(fastest.index, laps.index.get_indexer(fastest.to_numpy())))
+    session.lap_positions = lap_positions
+
+
+def get_fastest_lap(session, driver):
+    '''
+    Same as session.laps.pick_driver(driver).pick_fastest(), using the index
+    built by index_laps.
+
+    :param fastf1.core.Session session: Loaded session
+    :param str driver: Driver abbreviation or number
+    :return fastf1.core.Lap: Fastest lap of the driver, None if they have none
+    '''
+    if getattr(session, 'fastest_lap_positions', None) is None:
+        index_laps(session)
+    if driver in session.fastest_lap_positions:
+        return session.laps.iloc[session.fastest_lap_positions[driver]]
+    # not indexed by driver number, and drivers without a personal best end up here too
+    return session.laps.pick_driver(driver).pick_fastest()
+
+
 def get_lap(session, driver, lap_num):
+    '''
+    Gets a lap of a session from the index built by index_laps, indexing the
+    session first if needed.
+
+    :param fastf1.core.Session session: Loaded session
+    :param str driver: Driver abbreviation
+    :param str lap_num: Lap number, "-1" for the driver's fastest lap
+    :return fastf1.core.Laps: The lap, empty if there is no such lap
+    '''
+    if getattr(session, 'lap_positions', None) is None:
+        index_laps(session)
     if lap_num == "-1":
-        return session.laps.pick_driver(driver).pick_fastest()
-    return session.laps[(session.laps.Driver == driver) & (session.laps.LapNumber == int(lap_num))]
+        position = session.fastest_lap_positions.get(driver)
+        return session.laps.iloc[[] if position is None else [position]]
+    return session.laps.iloc[session.lap_positions.get((driver, int(lap_num)), [])]
+
+
+def compare_session_laps(session, laps, x_axis='Distance', by_sector=False, comb_laps=None):
+    '''
+    Resamples the telemetry of several laps of a session so they can be compared
+    sample by sample. Laps named ['COMB', n] are the average of the laps listed
+    in comb_laps under 'COMB-n'.
+
+    :param fastf1.core.Session session: Loaded session the laps are from
+    :param List[List[str]] laps: [driver, lap number] pairs, lap number "-1" is the fastest lap
+    :param str x_axis: 'Distance' or 'RelativeDistance', the column laps are aligned on, defaults to 'Distance'
+    :param bool by_sector: whether or not to align each sector separately, defaults to False
+    :param dict comb_laps: lists of [driver, lap number] pairs to average for each COMB lap, defaults to None
+    :return Tuple(List[fastf1.core.Telemetry], List[float]): resampled telemetry of each lap and sector distances (None if not by_sector)
+    '''
+    sector_dists = None
+    comb_lap_dfs = {}
+    for l in laps:
+        if l[0] == 'COMB':
+            # kept as Laps of the session, so get_lap_data can batch them
+            comb_lap_dfs[l[1]] = Laps(pd.concat(
+                [get_lap(session, lap[0], lap[1]) for lap in comb_laps[f"COMB-{l[1]}"]], ignore_index=True),
+                session=session)
+    driver_laps = [get_lap(session, l[0], l[1]).iloc[0] if l[0] != 'COMB' else average_lap(
+        comb_lap_dfs[l[1]]) for l in laps]
+    # averages are kept on the session, so editing a COMB lap only gets the telemetry of the laps that changed
+    driver_tel = [get_lap_telemetry(lap) if l[0] != 'COMB' else get_lap_average(
+        session, comb_lap_dfs[l[1]]) for l, lap in zip(laps, driver_laps)]
+    if by_sector:
+        # if len(driver_tel) == 2 and not comb_lap_dfs:
+        #     resampled_driver_tel, sector_dists = resample_2_by_sector(
+        #         driver_laps[0], driver_laps[1], driver_tel[0], driver_tel[1], x_axis=x_ax, return_dists=True)
+        # else:
+        resampled_driver_tel, sector_dists = resample_all_by_sector(
+            driver_laps, driver_tel, x_axis=x_axis, return_dists=True)
+    else:
+        # if len(driver_tel) == 2 and not comb_lap_dfs:
+        #     resampled_driver_tel = resample_2_by_dist(
+        #         driver_tel[0], driver_tel[1], x_axis=x_ax)
+        # else:
+        resampled_driver_tel = resample_all_by_dist(
+            driver_tel, x_axis=x_axis)
+    return resampled_driver_tel, sector_dists
@@ -0,0 +1,142 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import fastf1
+import pandas as pd
+
+_logger = logging.getLogger(__name__)
+
+# rough length of each session, used to guess when its data becomes available
+session_durations = {
+    'Practice 1': pd.Timedelta(hours=1),
+    'Practice 2': pd.Timedelta(hours=1),
+    'Practice 3': pd.Timedelta(hours=1),
+    'Qualifying': pd.Timedelta(hours=1),
+    'Sprint Qualifying': pd.Timedelta(minutes=45),
+    'Sprint Shootout': pd.Timedelta(minutes=45),
+    'Sprint': pd.Timedelta(hours=1),
+    'Race': pd.Timedelta(hours=2),
+}
+default_session_duration = pd.Timedelta(hours=2)
+
+
+def parse_session_key(key):
+    '''
+    Splits a session key formatted like get_session's cache keys.
+
+    :param str key: Key formatted as 'year-round-session', like '2022-11-Race'
+    :return Tuple(str, str, str): year, round and session name
+    '''
+    year, round, session_name = key.split('-', 2)
+    return year, round, session_name
+
+
+def get_ready_sessions(year, now, delay, window):
+    '''
+    Finds the sessions of a season whose data should have become available
+    during the window before now, guessing that data is available delay
+    after the session ends.
+
+    :param int year: Season to look at
+    :param pd.Timestamp now: Current time in UTC (timezone naive)
+    :param pd.Timedelta delay: Time after the end of a session before loading it
+    :param pd.Timedelta window: How far back to look for finished sessions
+    :return List[str]: Keys of the sessions, formatted as 'year-round-session'
+    '''
+    # testing events have no round number that get_session accepts
+    es = fastf1.get_event_schedule(year, include_testing=False)
+    es = es[es.F1ApiSupport]
+    keys = []
+    for i in range(1, 6):
+        names, starts = es[f"Session{i}"], es[f"Session{i}DateUtc"]
+        ready = starts + names.map(session_durations).fillna(
+            default_session_duration) + delay
+        selected = (ready <= now) & (ready > now - window)
+        keys += [f"{year}-{rn}-{name}" for rn,
+                 name in zip(es.RoundNumber[selected], names[selected])]
+    return keys
+
+
+class SessionPrewarmer:
+    '''
+    Loads sessions into the session cache in the background, so the first
+    user to open a session doesn't wait for it to load. Loads run on a small
+    thread pool so prewarming never uses more than a few threads at once.
+    '''
+
+    def __init__(self, load_func, workers=1, delay=30 * 60, poll_interval=10 * 60, window=24 * 60 * 60,
+                 max_attempts=3):
+        '''
+        :param function load_func: Function taking year, round and session name that loads the session into the cache
+        :param int workers: Maximum number of sessions loaded at the same time, defaults to 1
+        :param float delay: Seconds after the end of a session before it is loaded, defaults to 30 minutes
+        :param float poll_interval: Seconds between checks of the event schedule, defaults to 10 minutes
+        :param float window: Seconds back from now in which finished sessions are loaded, defaults to 1 day
+        :param int max_attempts: Number of times a session is tried before it is no longer queued, defaults to 3
+        '''
+        self.load_func = load_func
+        self.delay = pd.Timedelta(seconds=delay)
+        self.poll_interval = poll_interval
+        self.window = pd.Timedelta(seconds=window)
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix='prewarm')
+        self.max_attempts = max_attempts
+        self.submitted = set()
+        # number of failed loads of each session
+        self.failures = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _load(self, key):
+        try:
+            self.load_func(*parse_session_key(key))
+            _logger.info(f"Prewarmed session {key}")
+            # can be queued again, in case the cache evicts it later
+            self.submitted.discard(key)
+        except Exception:
+            self.failures[key] = self.failures.get(key, 0) + 1
+            if self.failures[key] < self.max_attempts:
+                _logger.exception(f"Failed to prewarm session {key}, it will be tried again")
+                self.submitted.discard(key)
+            else:
+                # stays in submitted, so it isn't queued again
+                _logger.exception(f"Failed to prewarm session {key} {self.failures[key]} times, giving up on it")
+
+    def prewarm(self, keys):
+        '''
+        Queues sessions to be loaded in the background. Sessions that are
+        already queued, or that failed too many times, are skipped. Loaded
+        sessions can be queued again, which is cheap while they're cached.
+
+        :param List[str] keys: Keys of the sessions, formatted as 'year-round-session'
+        '''
+        for key in keys:
+            if key not in self.submitted:
+                self.submitted.add(key)
+                self.executor.submit(self._load, key)
+
+    def check_schedule(self, now=None):
+        '''Queues every session of the current season that recently finished.'''
+        now = pd.Timestamp.now(tz='UTC').tz_localize(None) if now is None else now
+        try:
+            self.prewarm(get_ready_sessions(
+                now.year, now, self.delay, self.window))
+        except Exception:
+            _logger.exception("Failed to check the event schedule")
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.check_schedule()
+            self._stop.wait(self.poll_interval)
+
+    def start(self):
+        '''Starts checking the event schedule in a background thread.'''
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name='prewarm-scheduler', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,116 @@
+import json
+import re
+import struct
+
+import numpy as np
+
+# Accept header value asking for the binary format produced by to_binary
+COLUMNS_MIMETYPE = 'application/vnd.f1app.columns'
+# Accept header value asking for a stream of JSON records, one per line
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+_raw_placeholder = re.compile(r'"__raw_json_(\d+)__"')
+
+
+class Columns:
+    '''
+    Marks a dataframe inside a response to be encoded column by column, as
+    {column name: [values]}. Works with both to_json and to_binary.
+    '''
+
+    def __init__(self, df):
+        self.df = df
+
+
+def columns_json(df):
+    '''
+    Encodes the columns of a dataframe as a JSON object of value lists in a
+    single pass, using the pandas encoder directly on the column arrays.
+    Dates and timedeltas are encoded as milliseconds, missing values as null.
+
+    :param pd.DataFrame df: Dataframe to encode
+    :return str: JSON text of {column name: [values]}
+    '''
+    return '{' + ','.join(f"{json.dumps(str(c))}:{df[c].to_json(orient='values')}"
+                          for c in df.columns) + '}'
+
+
+def to_json(obj):
+    '''
+    Like json.dumps, but Columns inside obj are encoded with columns_json
+    and inserted as is, instead of being parsed and encoded again.
+
+    :param obj: Response to encode
+    :return str: JSON text
+    '''
+    fragments = []
+
+    def default(o):
+        if isinstance(o, Columns):
+            fragments.append(columns_json(o.df))
+            return f"__raw_json_{len(fragments) - 1}__"
+        raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+    text = json.dumps(obj, default=default)
+    return _raw_placeholder.sub(lambda m: fragments[int(m.group(1))], text)
+
+
+def column_array(col):
+    '''
+    Converts a column to the typed array sent in the binary format. Floats
+    are sent as float32, dates and timedeltas as float64 milliseconds (NaN if
+    missing, and unlike to_json keeping fractions of a millisecond), integers
+    as int32 and booleans as uint8.
+
+    :param pd.Series col: Column to convert
+    :return Tuple(str, np.ndarray): Type code and array, or (None, None) for columns sent as JSON
+    '''
+    kind = col.dtype.kind
+    if kind in 'mM':
+        values = col.to_numpy()
+        ms = values.view('int64') / 1e6
+        ms[np.isnat(values)] = np.nan
+        return 'f8', ms.astype('<f8')
+    if kind == 'f':
+        return 'f4', col.to_numpy().astype('<f4')
+    if kind in 'iu':
+        return 'i4', col.to_numpy().astype('<i4')
+    if kind == 'b':
+        return 'b1', col.to_numpy().astype('u1')
+    return None, None
+
+
+def to_binary(obj):
+    '''
+    Encodes a response with typed column arrays instead of JSON lists.
+
+    The result is a little-endian uint32 header length, a JSON header, and
+    the column buffers, each starting at a multiple of 8 bytes from the
+    first buffer. In the header, each numeric column of a Columns is replaced
+    by {"$col": type code, "offset": byte offset, "length": number of values}.
+    Other columns stay JSON lists.
+
+    :param obj: Response to encode
+    :return bytes: Encoded response
+    '''
+    buffers = []
+    offset = 0
+
+    def encode_column(col):
+        nonlocal offset
+        dtype, arr = column_array(col)
+        if dtype is None:
+            return json.loads(col.to_json(orient='values'))
+        data = arr.tobytes()
+        padding = -len(data) % 8
+        buffers.append(data + b'\0' * padding)
+        desc = {'$col': dtype, 'offset': offset, 'length': len(arr)}
+        offset += len(data) + padding
+        return desc
+
+    def default(o):
+        if isinstance(o, Columns):
+            return {str(c): encode_column(o.df[c]) for c in o.df.columns}
+        raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+    header = json.dumps(obj, default=default).encode()
+    header += b' ' * (-(len(header) + 4) % 8)
+    return struct.pack('<I', len(header)) + header + b''.join(buffers)
@@ -0,0 +1,227 @@
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import fastf1
+import pandas as pd
+from fastf1.core import Telemetry
+
+_logger = logging.getLogger(__name__)
+
+
+def column_to_array(col):
+    '''
+    Converts a telemetry column into an array that np.save can write and
+    np.load can memory map. Object columns are stored as fixed width strings,
+    with a mask of their missing values, which are read back as NaN.
+
+    :param pd.Series col: Column to convert
+    :return Tuple(np.ndarray, np.ndarray): Array with the column's values, and where values are missing (None if none are)
+    '''
+    if col.dtype == object:
+        missing = col.isna().to_numpy()
+        return col.fillna('').astype(str).to_numpy(dtype=str), missing if missing.any() else None
+    return col.to_numpy(), None
+
+
+class StoredSessionTelemetry:
+    '''
+    Merged telemetry of every lap of one session, read from a TelemetryStore.
+    Columns are memory mapped, so a lap only reads the pages it needs.
+    '''
+
+    def __init__(self, path, session=None):
+        '''
+        :param str path: Directory of the session inside the store
+        :param fastf1.core.Session session: Session attached to the returned telemetry, defaults to None
+        '''
+        self.path = path
+        self.session = session
+        with open(os.path.join(path, 'meta.json')) as f:
+            self.meta = json.load(f)
+        self._drivers = {}
+
+    def _open_driver(self, driver):
+        if driver not in self._drivers:
+            drv_path = os.path.join(self.path, driver)
+            lap_numbers = np.load(os.path.join(drv_path, 'LapNumber.npy'))
+            offsets = np.load(os.path.join(drv_path, 'offsets.npy'))
+            self._drivers[driver] = (
+                {ln: (s, e) for ln, s, e in zip(lap_numbers, offsets[:-1], offsets[1:])},
+                {c: np.load(os.path.join(drv_path, f"{c}.npy"), mmap_mode='r')
+                 for c in self.meta['columns']},
+                {c: np.load(os.path.join(drv_path, f"{c}.missing.npy"), mmap_mode='r')
+                 for c in self.meta['columns'] if os.path.exists(os.path.join(drv_path, f"{c}.missing.npy"))})
+        return self._drivers[driver]
+
+    @staticmethod
+    def _read_column(arr, missing, s, e):
+        if arr.dtype.kind != 'U':
+            return arr[s:e]
+        values = arr[s:e].astype(object)
+        if missing is not None:
+            values[missing[s:e]] = np.nan
+        return values
+
+    def get_lap(self, driver, lap_number):
+        '''
+        Gets the stored telemetry of a lap, the same as Lap.get_telemetry()
+        returned when the session was ingested.
+
+        :param str driver: Driver abbreviation
+        :param float lap_number: Lap number
+        :return fastf1.core.Telemetry: Telemetry of the lap, None if the lap wasn't stored
+        '''
+        if driver not in self.meta['drivers']:
+            return None
+        lap_bounds, columns, missing = self._open_driver(driver)
+        if float(lap_number) not in lap_bounds:
+            return None
+        s, e = lap_bounds[float(lap_number)]
+        tel = Telemetry({c: self._read_column(arr, missing.get(c), s, e)
+                         for c, arr in columns.items()}, session=self.session, driver=driver)
+        return tel
+
+
+class TelemetryStore:
+    '''
+    On-disk store of the merged per-lap telemetry of sessions, one .npy file
+    per column and driver. Telemetry is computed once with Lap.get_telemetry()
+    when a session is ingested, including Distance and RelativeDistance, and
+    read back later instead of being merged again.
+    '''
+
+    def __init__(self, root):
+        '''
+        :param str root: Directory the store is kept in
+        '''
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.root, key)
+
+    def has(self, key):
+        # meta.json is written last, so its presence means the ingest finished
+        return os.path.exists(os.path.join(self._path(key), 'meta.json'))
+
+    def open(self, key, session=None):
+        '''
+        :param str key: Key of the session, formatted as 'year-round-session'
+        :param fastf1.core.Session session: Session attached to the returned telemetry, defaults to None
+        :return StoredSessionTelemetry: Reader for the session, None if it wasn't ingested
+        '''
+        if not self.has(key):
+            return None
+        return StoredSessionTelemetry(self._path(key), session)
+
+    def ingest(self, session, key):
+        '''
+        Computes and writes the telemetry of every lap in a loaded session.
+        The data is written to a temporary directory and moved into place when
+        complete, so readers never see a partial session.
+
+        :param fastf1.core.Session session: Loaded session with telemetry
+        :param str key: Key of the session, formatted as 'year-round-session'
+        '''
+        if self.has(key):
+            return
+        tmp_path = tempfile.mkdtemp(prefix=f".{key}-", dir=self.root)
+        try:
+            columns = None
+            drivers = []
+            for driver, laps in session.laps.groupby('Driver'):
+                lap_tels, lap_numbers = [], []
+                for _, lap in laps.iterlaps():
+                    try:
+                        tel = lap.get_telemetry()
+                    except Exception:  # laps without telemetry can't be compared anyway
+                        continue
+                    if len(tel) == 0:
+                        continue
+                    lap_tels.append(tel)
+                    lap_numbers.append(lap['LapNumber'])
+                if not lap_tels:
+                    continue
+                driver_tel = pd.concat(lap_tels, ignore_index=True)
+                columns = list(driver_tel.columns) if columns is None else columns
+                drv_path = os.path.join(tmp_path, driver)
+                os.makedirs(drv_path)
+                for c in columns:
+                    values, missing = column_to_array(driver_tel[c])
+                    np.save(os.path.join(drv_path, f"{c}.npy"), values)
+                    if missing is not None:
+                        np.save(os.path.join(drv_path, f"{c}.missing.npy"), missing)
+                np.save(os.path.join(drv_path, 'LapNumber.npy'),
+                        np.array(lap_numbers, dtype='float64'))
+                np.save(os.path.join(drv_path, 'offsets.npy'),
+                        np.cumsum([0] + [len(t) for t in lap_tels]))
+                drivers.append(driver)
+            with open(os.path.join(tmp_path, 'meta.json'), 'w') as f:
+                json.dump({'drivers': drivers, 'columns': columns or []}, f)
+            try:
+                os.rename(tmp_path, self._path(key))
+            except OSError:  # ingested by someone else in the meantime
+                shutil.rmtree(tmp_path, ignore_errors=True)
+        except BaseException:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            raise
+        _logger.info(f"Ingested telemetry of {key}")
+
+    def attach(self, session, key, executor=None, load_func=None):
+        '''
+        Sets session.stored_telemetry to the session's stored telemetry. If the
+        session wasn't ingested yet, ingests it first. With an executor from
+        ingest_executor, the ingest runs in another process, which loads the
+        session again with load_func, so merging the telemetry of every lap
+        doesn't hold up the requests of this process. The stored telemetry is
+        attached once it's done.
+
+        :param fastf1.core.Session session: Loaded session with telemetry
+        :param str key: Key of the session, formatted as 'year-round-session'
+        :param concurrent.futures.ProcessPoolExecutor executor: Executor to ingest in, defaults to None (ingest now, in this process)
+        :param function load_func: Module level function taking year, round and session name that loads the session, required with executor
+        '''
+        if self.has(key):
+            session.stored_telemetry = self.open(key, session)
+        elif executor is not None:
+            def attach_when_done(future):
+                if future.exception() is not None:
+                    _logger.error(f"Failed to ingest telemetry of {key}: {future.exception()!r}")
+                elif self.has(key):
+                    session.stored_telemetry = self.open(key, session)
+            executor.submit(_load_and_ingest, self.root, key, load_func).add_done_callback(attach_when_done)
+        else:
+            try:
+                self.ingest(session, key)
+                session.stored_telemetry = self.open(key, session)
+            except Exception:
+                _logger.exception(f"Failed to ingest telemetry of {key}")
+
+
+def _init_ingest_worker(cache_dir):
+    fastf1.Cache.enable_cache(cache_dir)
+
+
+def _load_and_ingest(root, key, load_func):
+    year, round, session_name = key.split('-', 2)
+    TelemetryStore(root).ingest(load_func(year, round, session_name), key)
+
+
+def ingest_executor(cache_dir='./cache', workers=1):
+    '''
+    Makes an executor for TelemetryStore.attach to ingest sessions in. Every
+    ingest gets a fresh process, so the session it loaded is freed when it's
+    done.
+
+    :param str cache_dir: fastf1 cache directory the workers load sessions from, defaults to './cache'
+    :param int workers: Number of sessions ingested at the same time, defaults to 1
+    :return concurrent.futures.ProcessPoolExecutor: Executor
+    '''
+    return ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'), max_tasks_per_child=1,
+                               initializer=_init_ingest_worker, initargs=(os.path.abspath(cache_dir),))
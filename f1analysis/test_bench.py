@@ -0,0 +1,10 @@
+import bench
+
+
+def test_bench_runs(tmp_path, monkeypatch):
+    # from an empty directory, like a fresh checkout without ./cache
+    monkeypatch.chdir(tmp_path)
+    output = tmp_path / 'bench.txt'
+    assert bench.main(['--drivers', '2', '--laps', '2', '--repeat', '1', '--output', str(output)]) == 0
+    names = [line.split()[0] for line in output.read_text().splitlines()[1:]]
+    assert 'compare_lap_times' in names and '/comp' in names